@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -36,4 +38,14 @@ assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts'])
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
+    'tests.fixtures.fixture_query_budget',
 ]
+
+
+@pytest.fixture(autouse=True)
+def inline_background_jobs(settings):
+    # Миниатюры и доставка в ленты идут в потоке теста: фоновый поток
+    # писал бы в базу и во временный MEDIA_ROOT, пока тест и фикстуры
+    # с ними работают
+    settings.THUMBNAIL_WORKERS = 0
+    settings.FEED_WORKERS = 0
@@ -0,0 +1,57 @@
+import random
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from posts.loadgen import generate, scale
+
+
+class QueryBudget:
+    """Open urls with a cold cache and collect those over their budget."""
+
+    def __init__(self):
+        self.failures = []
+
+    def check(self, client, url, budget, label=''):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+            if response.streaming:
+                # Потоковый ответ читает базу, пока отдаётся
+                b''.join(response.streaming_content)
+        assert response.status_code < 500, (
+            f'Страница `{url}` отвечает ошибкой {response.status_code}'
+        )
+        if len(queries) > budget:
+            self.failures.append(
+                f'{label} `{url}`: {len(queries)} запросов при бюджете '
+                f'{budget}:\n' + '\n'.join(
+                    f'    {query["sql"]}' for query in queries
+                )
+            )
+        return len(queries)
+
+    def verify(self):
+        assert not self.failures, (
+            'Страницы превышают бюджет запросов, проверьте select_related '
+            'и запросы в шаблонах:\n' + '\n'.join(self.failures)
+        )
+
+
+@pytest.fixture
+def query_budget():
+    return QueryBudget()
+
+
+@pytest.fixture
+def grow_data(db):
+    """Grow the database to the given number of synthetic posts."""
+    rng = random.Random(0)
+    generated = 0
+
+    def grow(posts):
+        nonlocal generated
+        generate(rng, **scale(posts - generated))
+        generated = posts
+    return grow
@@ -0,0 +1,76 @@
+import pytest
+from django.urls import reverse
+from posts.loadgen import route_arguments, routes
+
+pytestmark = [pytest.mark.django_db]
+
+# Маршрут: (запросов для гостя, запросов для пользователя) с холодным
+# кешем. У пользователя два запроса уходят на сессию и его запись.
+# Новый маршрут должен появиться здесь, иначе тест упадёт
+BUDGETS = {
+    'posts:index': (2, 4),
+    'posts:group_list': (3, 5),
+    'posts:profile': (3, 6),
+    'posts:post_detail': (3, 5),
+    'posts:post_comments': (2, 4),
+    'posts:post_create': (0, 5),
+    'posts:post_edit': (0, 3),
+    'posts:add_comment': (0, 5),
+    'posts:follow_index': (0, 5),
+    'posts:search': (3, 5),
+    'posts:export_posts': (0, 3),
+    'posts:profile_follow': (0, 6),
+    'posts:profile_unfollow': (0, 10),
+    'api:index': (2, 2),
+    'api:group_list': (3, 3),
+    'api:profile': (3, 3),
+    'api:follow_index': (0, 6),
+    'api:post_detail': (2, 2),
+    'api:comments': (3, 3),
+    'users:password_reset_confirm': (1, 3),
+    'users:logout': (0, 4),
+    'users:signup': (0, 2),
+    'users:login': (0, 2),
+    'users:password_reset_form': (0, 2),
+    'users:password_reset_done': (0, 2),
+    'users:password_reset_complete': (0, 2),
+    'users:password_change_done': (0, 2),
+    'users:password_change': (0, 2),
+    'about:author': (0, 2),
+    'about:tech': (0, 2),
+}
+# Параметры запроса, без которых страница не делает основной работы
+QUERY = {
+    'posts:search': '?q=пост',
+}
+SIZES = (10, 1000)
+
+
+def test_every_route_has_budget():
+    names = {name for name, _ in routes()}
+    assert names == set(BUDGETS), (
+        'Добавьте бюджет запросов для новых маршрутов и уберите удалённые: '
+        f'{sorted(names ^ set(BUDGETS))}'
+    )
+
+
+def test_routes_fit_query_budget(client, grow_data, query_budget):
+    """Число запросов не растёт вместе с данными и размером страницы."""
+    for size in SIZES:
+        grow_data(size)
+        reader, values = route_arguments()
+        for name, params in routes():
+            url = reverse(
+                name, kwargs={key: values[key] for key in params}
+            ) + QUERY.get(name, '')
+            guest_budget, user_budget = BUDGETS[name]
+            client.logout()
+            query_budget.check(
+                client, url, guest_budget, f'{size} строк, гость'
+            )
+            # logout выходит из сессии, поэтому входим перед каждым адресом
+            client.force_login(reader)
+            query_budget.check(
+                client, url, user_budget, f'{size} строк, пользователь'
+            )
+    query_budget.verify()
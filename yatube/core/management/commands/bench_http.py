@@ -0,0 +1,167 @@
+import json
+import logging
+import multiprocessing
+import statistics
+import threading
+import time
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                          WSGIRequestHandler,
+                                          get_internal_wsgi_application)
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from posts.loadgen import route_arguments
+from posts.models import UserStats
+
+# Тяжёлые на чтение маршруты: ленты, профиль и страница поста
+ROUTES = (
+    ('posts:index', ()),
+    ('posts:group_list', ('slug',)),
+    ('posts:profile', ('username',)),
+    ('posts:post_detail', ('post_id',)),
+    ('posts:follow_index', ()),
+)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port):
+    """Child process: the project WSGI application on a threaded server."""
+    logging.disable(logging.ERROR)
+    httpd = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+    httpd.set_app(get_internal_wsgi_application())
+    port.send(httpd.server_address[1])
+    port.close()
+    httpd.serve_forever()
+
+
+def fetch(url, cookie):
+    """Milliseconds the url took, raises OSError on errors and 4xx/5xx."""
+    request = urllib.request.Request(url, headers={'Cookie': cookie})
+    started = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=30) as response:
+        response.read()
+    return (time.perf_counter() - started) * 1000
+
+
+def hammer(urls, cookie, deadline, latencies, errors):
+    """Client thread: fetch the urls in turn until the deadline."""
+    number = 0
+    while time.time() < deadline:
+        url = urls[number % len(urls)]
+        number += 1
+        try:
+            latencies.append(fetch(url, cookie))
+        except OSError:
+            # HTTPError и URLError - тоже OSError
+            errors.append(url)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает ленты, профиль и страницу поста параллельными '
+        'HTTP-клиентами на каждом уровне --concurrency и печатает JSON '
+        'с пропускной способностью и задержками. Без --url поднимает '
+        'проект на многопоточном WSGI-сервере в отдельном процессе; с '
+        '--url меряет уже запущенный сервер с той же базой, например '
+        'другой сервер приложений, для сравнения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', help='Адрес запущенного сервера, http://host:port.'
+        )
+        parser.add_argument(
+            '--concurrency', default='1,8,32,128',
+            help='Числа одновременных клиентов через запятую.'
+        )
+        parser.add_argument(
+            '--seconds', type=float, default=10,
+            help='Длительность замера на каждом уровне.'
+        )
+
+    def handle(self, *args, **options):
+        if not UserStats.objects.exists():
+            raise CommandError(
+                'База пуста, заполните её командой generate_load_data'
+            )
+        reader, values = route_arguments()
+        client = Client()
+        client.force_login(reader)
+        cookie = (
+            f'{settings.SESSION_COOKIE_NAME}='
+            f'{client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        )
+        paths = [
+            reverse(name, kwargs={key: values[key] for key in params})
+            for name, params in ROUTES
+        ]
+        server = None
+        base = options['url']
+        if not base:
+            server, base = self.start_server()
+        try:
+            for level in sorted(
+                int(level) for level in options['concurrency'].split(',')
+            ):
+                row = self.measure(
+                    [base.rstrip('/') + path for path in paths], cookie,
+                    level, options['seconds'],
+                )
+                self.stdout.write(json.dumps({
+                    'server': options['url'] or 'wsgi', **row
+                }))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.join()
+
+    def start_server(self):
+        # fork: процесс сервера наследует настройки; соединения с базой
+        # открывает заново
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        receive, send = context.Pipe(duplex=False)
+        server = context.Process(target=serve, args=(send,), daemon=True)
+        server.start()
+        port = receive.recv()
+        return server, f'http://127.0.0.1:{port}'
+
+    def measure(self, urls, cookie, level, seconds):
+        # Первый проход прогревает кеш страниц
+        for url in urls:
+            fetch(url, cookie)
+        latencies, errors = [], []
+        deadline = time.time() + seconds
+        threads = [
+            threading.Thread(
+                target=hammer,
+                args=(urls, cookie, deadline, latencies, errors),
+            )
+            for _ in range(level)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        quantiles = (
+            statistics.quantiles(latencies, n=100)
+            if len(latencies) > 1 else [None] * 99
+        )
+        return {
+            'concurrency': level,
+            'seconds': seconds,
+            'requests_per_second': round(len(latencies) / seconds, 1),
+            'errors': len(errors),
+            'p50_ms': quantiles[49] and round(quantiles[49], 2),
+            'p95_ms': quantiles[94] and round(quantiles[94], 2),
+            'p99_ms': quantiles[98] and round(quantiles[98], 2),
+        }
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from core.replicas import copy_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite во все реплики из READ_REPLICAS. '
+        'С --interval повторяет копирование, изображая отставание '
+        'репликации.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Копировать каждые столько секунд, пока не прервут.'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.READ_REPLICAS:
+            raise CommandError(
+                'Реплик нет, задайте YATUBE_READ_REPLICAS'
+            )
+        source = settings.DATABASES[DEFAULT_DB_ALIAS]['NAME']
+        while True:
+            for alias in settings.READ_REPLICAS:
+                copy_database(source, settings.DATABASES[alias]['NAME'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Скопировано в {", ".join(settings.READ_REPLICAS)}'
+            ))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
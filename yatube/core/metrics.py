@@ -0,0 +1,174 @@
+"""Per-view histograms of what requests cost.
+
+Each process sums its requests in memory and adds them to counters in
+the cache every REQUEST_METRICS_FLUSH_SECONDS. With a shared cache (file
+or memcached) the admin endpoint sees every worker, with locmem only
+the process answering it.
+"""
+import heapq
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.base import Template
+
+# Верхние границы корзин гистограмм, последняя корзина - всё, что больше
+BUCKETS = {
+    'queries': (0, 1, 2, 5, 10, 20, 50, 100),
+    'db_ms': (1, 5, 10, 25, 50, 100, 250, 500, 1000),
+    'template_ms': (1, 5, 10, 25, 50, 100, 250, 500, 1000),
+    'total_ms': (5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+    'bytes': (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000),
+}
+# incr работает только с целыми: время копится в микросекундах
+SCALE = {'db_ms': 1000, 'template_ms': 1000, 'total_ms': 1000}
+KEY = 'metrics:{}:{}:{}'
+VIEWS_KEY = 'metrics:views'
+OVERFLOW = 'inf'
+
+_lock = threading.Lock()
+_pending = Counter()
+_views = set()
+_flushed = time.monotonic()
+_local = threading.local()
+
+
+class Sample:
+    """Costs of one request, filled by the database and template hooks."""
+
+    def __init__(self, keep):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.depth = 0
+        self.keep = keep
+        self.slowest = []
+
+    def execute(self, execute, sql, params, many, context):
+        """connection.execute_wrapper() hook timing every query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.queries += 1
+            self.db_ms += elapsed
+            entry = (elapsed, self.queries, sql)
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, entry)
+            elif self.keep:
+                heapq.heappushpop(self.slowest, entry)
+
+    def slow_queries(self):
+        return [
+            (round(elapsed, 2), sql)
+            for elapsed, _, sql in sorted(self.slowest, reverse=True)
+        ]
+
+
+def start(sample):
+    _local.sample = sample
+
+
+def stop():
+    _local.sample = None
+
+
+def instrument_templates():
+    """Count time of outermost template renders into the current sample.
+
+    Included templates are part of the outer render and are not counted
+    twice. Queries run by lazy querysets while rendering are counted
+    both here and in db_ms.
+    """
+    if getattr(Template._render, 'timed', False):
+        return
+    original = Template._render
+
+    def _render(self, context):
+        sample = getattr(_local, 'sample', None)
+        if sample is None or sample.depth:
+            return original(self, context)
+        sample.depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            sample.depth -= 1
+            sample.template_ms += (time.perf_counter() - started) * 1000
+    _render.timed = True
+    Template._render = _render
+
+
+def bucket(metric, value):
+    for bound in BUCKETS[metric]:
+        if value <= bound:
+            return str(bound)
+    return OVERFLOW
+
+
+def record(view, values):
+    """Add one request of the view, values are keyed like BUCKETS."""
+    with _lock:
+        _views.add(view)
+        _pending[KEY.format(view, 'requests', '')] += 1
+        for metric, value in values.items():
+            if value is None:
+                continue
+            _pending[KEY.format(view, metric, bucket(metric, value))] += 1
+            _pending[KEY.format(view, metric, 'sum')] += round(
+                value * SCALE.get(metric, 1)
+            )
+
+
+def flush(force=False):
+    """Move counters of this process into the cache, at most so often."""
+    global _flushed
+    with _lock:
+        if not force and (time.monotonic() - _flushed
+                          < settings.REQUEST_METRICS_FLUSH_SECONDS):
+            return
+        pending, views = dict(_pending), set(_views)
+        _pending.clear()
+        _flushed = time.monotonic()
+    known = cache.get(VIEWS_KEY, set())
+    if not views <= known:
+        cache.set(VIEWS_KEY, known | views, None)
+    for key, value in pending.items():
+        if cache.add(key, value, None):
+            continue
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            # Ключ вытеснен между add и incr
+            cache.set(key, value, None)
+
+
+def _keys(view):
+    yield KEY.format(view, 'requests', '')
+    for metric, bounds in BUCKETS.items():
+        for name in (*map(str, bounds), OVERFLOW, 'sum'):
+            yield KEY.format(view, metric, name)
+
+
+def snapshot():
+    """Histograms of every view seen by any process, for the endpoint."""
+    flush(force=True)
+    views = sorted(cache.get(VIEWS_KEY, ()))
+    found = cache.get_many([key for view in views for key in _keys(view)])
+    result = {}
+    for view in views:
+        data = {'requests': found.get(KEY.format(view, 'requests', ''), 0)}
+        for metric, bounds in BUCKETS.items():
+            total = found.get(KEY.format(view, metric, 'sum'), 0)
+            data[metric] = {
+                'sum': total / SCALE.get(metric, 1),
+                'buckets': {
+                    name: found.get(KEY.format(view, metric, name), 0)
+                    for name in (*map(str, bounds), OVERFLOW)
+                },
+            }
+        result[view] = data
+    return result
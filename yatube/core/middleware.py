@@ -0,0 +1,60 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """Record queries, database and template time and size of responses.
+
+    Turned on by REQUEST_METRICS. Requests slower than
+    REQUEST_METRICS_SLOW_MS are logged with their slowest queries.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        metrics.instrument_templates()
+
+    def __call__(self, request):
+        sample = metrics.Sample(settings.REQUEST_METRICS_SLOW_QUERIES)
+        metrics.start(sample)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(sample.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        total_ms = (time.perf_counter() - started) * 1000
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '-'
+        metrics.record(view, {
+            'queries': sample.queries,
+            'db_ms': sample.db_ms,
+            'template_ms': sample.template_ms,
+            'total_ms': total_ms,
+            'bytes': None if response.streaming else len(response.content),
+        })
+        slow_ms = settings.REQUEST_METRICS_SLOW_MS
+        if slow_ms is not None and total_ms >= slow_ms:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, запросов к базе %d '
+                'на %.0f мс, шаблоны %.0f мс, самые долгие запросы: %s',
+                request.method, request.get_full_path(), view, total_ms,
+                sample.queries, sample.db_ms, sample.template_ms,
+                sample.slow_queries(),
+            )
+        metrics.flush()
+        return response
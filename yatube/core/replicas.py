@@ -0,0 +1,114 @@
+"""Read replicas for the feed and post pages.
+
+Views wrapped in replica_reads() send their reads to a random database
+of READ_REPLICAS. A user who has just written something, signed up or
+logged in gets a cookie and reads the primary for REPLICA_PIN_SECONDS,
+so their own post or comment is there even when the replicas lag
+behind. The session and its user are always read from the primary.
+"""
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'pin_primary'
+# Отставшая реплика сессий разлогинила бы только что вошедших
+PRIMARY_APPS = {'sessions'}
+
+_local = threading.local()
+
+
+def pinned(request):
+    """Whether the user wrote something less than REPLICA_PIN_SECONDS ago."""
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+@contextmanager
+def reads():
+    """Route reads made inside the block to the replicas."""
+    previous = getattr(_local, 'replica', False)
+    _local.replica = True
+    try:
+        yield
+    finally:
+        _local.replica = previous
+
+
+def replica_reads(view):
+    """Serve safe requests of users not pinned to the primary from replicas.
+
+    Sets request.from_replica, so caches know the page may be stale.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.from_replica = bool(
+            settings.READ_REPLICAS
+            and request.method in ('GET', 'HEAD')
+            and not pinned(request)
+        )
+        if not request.from_replica:
+            return view(request, *args, **kwargs)
+        # request.user ленивый: читаем его здесь, из основной базы, иначе
+        # только что созданная учётная запись на реплике не нашлась бы
+        request.user.is_authenticated
+        with reads():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def pin_primary(view):
+    """Pin the user to the primary for a while after a successful write.
+
+    Writes of the site end with a redirect, so only redirects pin.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code in (301, 302):
+            response.set_cookie(
+                PIN_COOKIE, str(time.time() + settings.REPLICA_PIN_SECONDS),
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                samesite='Lax',
+            )
+        return response
+    return wrapper
+
+
+class ReplicaRouter:
+    """Writes, migrations and reads outside replica_reads() use default."""
+
+    def db_for_read(self, model, **hints):
+        if not getattr(_local, 'replica', False):
+            return None
+        if model._meta.app_label in PRIMARY_APPS:
+            return None
+        return random.choice(settings.READ_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def copy_database(source, target):
+    """Copy an SQLite file consistently, the local stand-in for replication."""
+    primary = sqlite3.connect(source)
+    replica = sqlite3.connect(target)
+    try:
+        primary.backup(replica)
+    finally:
+        replica.close()
+        primary.close()
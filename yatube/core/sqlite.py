@@ -0,0 +1,29 @@
+"""Tuning of SQLite connections for concurrent writers.
+
+Every new connection gets SQLITE_PRAGMAS. With
+SQLITE_IMMEDIATE_TRANSACTIONS atomic blocks start with BEGIN IMMEDIATE,
+so writers queue on busy_timeout instead of failing with "database is
+locked" when a deferred transaction can't upgrade its read lock.
+"""
+from functools import partial
+
+from django.conf import settings
+
+
+def _begin_immediate(connection):
+    connection.cursor().execute('BEGIN IMMEDIATE')
+
+
+def configure(sender, connection, **kwargs):
+    """connection_created receiver applying the SQLite settings."""
+    if connection.vendor != 'sqlite':
+        return
+    # Сырое соединение: прагмы не попадают в счётчики запросов
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+    if settings.SQLITE_IMMEDIATE_TRANSACTIONS:
+        connection._start_transaction_under_autocommit = partial(
+            _begin_immediate, connection
+        )
+    else:
+        connection.__dict__.pop('_start_transaction_under_autocommit', None)
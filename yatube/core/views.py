@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import metrics
+
 
 def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию;
@@ -17,3 +21,8 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+@staff_member_required
+def request_metrics(request):
+    return JsonResponse(metrics.snapshot())
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from .models import Comment, Follow, Group, Post, UserStats
+from .search import backend
 
 
 @admin.register(Post)
@@ -18,6 +19,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу вместо LIKE '%...%' по всей таблице
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=backend().search(search_term)), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -39,3 +46,10 @@ class FollowAdmin(admin.ModelAdmin):
     search_fields = ('author',)
     list_filter = ('user',)
     empty_value_display = '-пусто-'
+
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'posts', 'comments', 'followers',
+                    'following')
+    search_fields = ('user__username',)
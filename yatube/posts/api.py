@@ -0,0 +1,181 @@
+"""Read-only JSON versions of the feeds, the post page and its comments.
+
+Every view answers conditional GET. The ETag and Last-Modified come from
+the card versions bumped on any post, group or author edit and, for a
+numbered page, from an aggregate over the same queryset (count and
+latest date). A cursor page is read once, before the check, and is
+described by its own rows. A client with a fresh copy gets 304 without
+anything being serialized.
+"""
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import condition, require_safe
+
+from .feed import follow_feed
+from .freshness import feed_aggregate, page_rows, state
+from .models import Group, Post, User
+from .views import comments_page, paginate
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'author': post.author.username,
+        'author_name': post.author.get_full_name(),
+        'group': post.group.slug if post.group_id else None,
+        'group_title': post.group.title if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'url': reverse('api:post_detail', args=[post.pk]),
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'created': comment.created,
+        'author': comment.author.username,
+    }
+
+
+def page_url(request, page_obj, forward):
+    if hasattr(page_obj, 'next_cursor'):
+        cursor = page_obj.next_cursor if forward else page_obj.previous_cursor
+        return f'{request.path}?cursor={cursor}' if cursor else None
+    if forward and page_obj.has_next():
+        return f'{request.path}?page={page_obj.next_page_number()}'
+    if not forward and page_obj.has_previous():
+        return f'{request.path}?page={page_obj.previous_page_number()}'
+    return None
+
+
+def feed_response(request, posts):
+    # Курсорную страницу или число постов уже прочитал feed_state
+    page_obj = getattr(request, '_api_page', None)
+    if page_obj is None:
+        page_obj = paginate(
+            posts, request, getattr(request, '_api_count', None)
+        )
+    data = {
+        'next': page_url(request, page_obj, forward=True),
+        'previous': page_url(request, page_obj, forward=False),
+        'results': [serialize_post(post) for post in page_obj],
+    }
+    if page_obj.number is not None:
+        data['count'] = page_obj.paginator.count
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+def conditional(get_state):
+    """condition() fed by get_state, evaluated once per request.
+
+    get_state returns (etag, last_modified) or None when the view has to
+    answer on its own, for example with 404.
+    """
+    def cached(request, *args, **kwargs):
+        if not hasattr(request, '_api_state'):
+            request._api_state = get_state(request, *args, **kwargs)
+        return request._api_state or (None, None)
+
+    def decorator(view):
+        @wraps(view)
+        @require_safe
+        @condition(
+            etag_func=lambda *a, **kw: cached(*a, **kw)[0],
+            last_modified_func=lambda *a, **kw: cached(*a, **kw)[1],
+        )
+        def wrapper(request, *args, **kwargs):
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def feed_state(request, posts, *parts):
+    if 'cursor' in request.GET:
+        request._api_page = paginate(posts, request)
+        rows, last = page_rows(request._api_page)
+        return state(request.get_full_path(), *rows, *parts, last=last)
+    aggregate = feed_aggregate(posts)
+    request._api_count = aggregate['count']
+    return state(
+        request.get_full_path(), aggregate['count'], *parts,
+        last=aggregate['last'],
+    )
+
+
+@conditional(lambda request: feed_state(request, Post.objects.for_feed()))
+def index(request):
+    return feed_response(request, Post.objects.for_feed())
+
+
+@conditional(lambda request, slug: feed_state(
+    request, Post.objects.for_feed().filter(group__slug=slug)
+))
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.posts.for_feed())
+
+
+@conditional(lambda request, username: feed_state(
+    request, Post.objects.for_feed().filter(author__username=username)
+))
+def profile(request, username):
+    user = get_object_or_404(User, username=username)
+    return feed_response(request, user.posts.for_feed())
+
+
+def follow_state(request):
+    if not request.user.is_authenticated:
+        return None
+    return feed_state(request, follow_feed(request.user), request.user.pk)
+
+
+@conditional(follow_state)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Нужно войти на сайт'}, status=401,
+            json_dumps_params={'ensure_ascii': False},
+        )
+    return feed_response(request, follow_feed(request.user))
+
+
+def post_state(request, post_id):
+    row = Post.objects.filter(pk=post_id).annotate(
+        comments_count=Count('comments'), last_comment=Max('comments__created')
+    ).values_list('pub_date', 'comments_count', 'last_comment').first()
+    if row is None:
+        return None
+    pub_date, comments, last_comment = row
+    return state(
+        request.get_full_path(), comments,
+        last=max(filter(None, (pub_date, last_comment))),
+    )
+
+
+@conditional(post_state)
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.for_feed(), id=post_id)
+    data = serialize_post(post)
+    data['comments'] = reverse('api:comments', args=[post.pk])
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+@conditional(post_state)
+def comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
+    page_obj = comments_page(post, request)
+    return JsonResponse(
+        {
+            'next': page_url(request, page_obj, forward=True),
+            'previous': page_url(request, page_obj, forward=False),
+            'results': [serialize_comment(comment) for comment in page_obj],
+        },
+        json_dumps_params={'ensure_ascii': False},
+    )
@@ -0,0 +1,16 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', api.index, name='index'),
+    path('group/<slug:slug>/', api.group_posts, name='group_list'),
+    path('profile/<str:username>/', api.profile, name='profile'),
+    path('follow/', api.follow_index, name='follow_index'),
+    path('posts/<int:post_id>/', api.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/', api.comments, name='comments'
+    ),
+]
@@ -0,0 +1,78 @@
+"""Jobs run once the transaction commits, outside the request thread.
+
+Every pool takes its number of threads from a setting. With 0 the jobs
+run right in the on_commit callback, in the committing thread (so in
+tests). Pools start their threads on first use and are drained at
+interpreter exit.
+"""
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+_pools = []
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s не выполнена', func.__name__)
+
+
+def _run_in_worker(func, *args):
+    try:
+        _run(func, *args)
+    finally:
+        connection.close()
+
+
+class Pool:
+    """Threads named after the pool, as many as the setting says."""
+
+    def __init__(self, name, workers_setting):
+        self.name = name
+        self.workers_setting = workers_setting
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+        _pools.append(self)
+
+    def after_commit(self, func, *args):
+        """Call func(*args) once the current transaction commits."""
+        if getattr(settings, self.workers_setting):
+            transaction.on_commit(lambda: self._submit(func, *args))
+        else:
+            transaction.on_commit(lambda: _run(func, *args))
+
+    def _submit(self, func, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, self.workers_setting),
+                    thread_name_prefix=self.name,
+                )
+            future = self._executor.submit(_run_in_worker, func, *args)
+            self._pending.add(future)
+        future.add_done_callback(self._forget)
+
+    def _forget(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def drain(self, timeout=None):
+        """Block until every submitted job has finished."""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+
+
+@atexit.register
+def drain():
+    """Wait for the jobs of every pool."""
+    for pool in _pools:
+        pool.drain()
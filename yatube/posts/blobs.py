@@ -0,0 +1,71 @@
+import logging
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .models import MediaBlob, Post
+
+logger = logging.getLogger(__name__)
+
+
+def storage():
+    return Post._meta.get_field('image').storage
+
+
+def acquire(name):
+    """Count one more post referring to the stored file."""
+    blobs = MediaBlob.objects.filter(name=name)
+    if blobs.update(refs=F('refs') + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, refs=1)
+    except IntegrityError:
+        blobs.update(refs=F('refs') + 1)
+
+
+def release(name):
+    """Drop one reference, the last one deletes file and thumbnails."""
+    MediaBlob.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1
+    )
+    deleted, _ = MediaBlob.objects.filter(name=name, refs=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: purge(name))
+
+
+def purge(name):
+    """Delete a file no post refers to any more.
+
+    Runs holding the write lock (BEGIN IMMEDIATE). A post saving the
+    same file writes it inside its own atomic block, so either it has
+    committed and is seen here, or it writes the file after the delete.
+    """
+    try:
+        with transaction.atomic():
+            if MediaBlob.objects.filter(name=name).exists() or (
+                Post.objects.filter(image=name).exists()
+            ):
+                # Тот же файл успели загрузить снова
+                return
+            default.kvstore.delete(ImageFile(name, storage()))
+            storage().delete(name)
+    except (OSError, SuspiciousFileOperation):
+        # Уборка после коммита не должна ломать запрос
+        logger.exception('Не удалось удалить файл %s', name)
+
+
+def recount():
+    """Set refs of every blob from the posts after a load without signals."""
+    names = Post.objects.exclude(image='').exclude(
+        image__isnull=True
+    ).values_list('image').annotate(total=Count('pk')).order_by()
+    with transaction.atomic():
+        MediaBlob.objects.all().delete()
+        MediaBlob.objects.bulk_create(
+            (MediaBlob(name=name, refs=total) for name, total in names),
+            batch_size=1000,
+        )
@@ -0,0 +1,67 @@
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'post_card:v:{}:{}'
+# Версия всех объектов вида сразу, меняется вместе с любой из них
+ANY = '*'
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def bump(kind, pk):
+    """Invalidate every cached card depending on the given object."""
+    version = _new_version()
+    cache.set_many({
+        VERSION_KEY.format(kind, pk): version,
+        VERSION_KEY.format(kind, ANY): version,
+    }, None)
+
+
+def kind_keys(kinds):
+    """Keys of the versions covering every object of the kinds."""
+    return [VERSION_KEY.format(kind, ANY) for kind in kinds]
+
+
+def current(keys, found):
+    """Values of version keys read into found, creating missing ones."""
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def last_change(*kinds):
+    """Time in ns of the latest change of any object of the kinds."""
+    keys = kind_keys(kinds)
+    return max(current(keys, cache.get_many(keys)))
+
+
+def attach_versions(posts):
+    """Set post.card_version used as the key of the cached card.
+
+    The version combines the post, its group and its author, so editing
+    any of them makes every feed render a fresh card. All versions of a
+    page are fetched with a single get_many.
+    """
+    posts = list(posts)
+    keys = {}
+    for post in posts:
+        keys[post.pk] = (
+            VERSION_KEY.format('post', post.pk),
+            VERSION_KEY.format('group', post.group_id),
+            VERSION_KEY.format('user', post.author_id),
+        )
+    wanted = {key for triple in keys.values() for key in triple}
+    versions = cache.get_many(wanted)
+    missing = {key: _new_version() for key in wanted - versions.keys()}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    for post in posts:
+        post.card_version = '.'.join(
+            str(versions[key]) for key in keys[post.pk]
+        )
@@ -0,0 +1,135 @@
+from django.db import connection
+from django.db.models import F, Q
+
+from .background import Pool
+from .models import FeedEntry, Follow, Post, UserStats
+from .settings import (FEED_BACKFILL_POSTS, FEED_BATCH_SIZE,
+                       FEED_FANOUT_MAX_FOLLOWERS)
+
+pool = Pool('feed', 'FEED_WORKERS')
+
+
+def is_celebrity(author_id):
+    """Posts of such authors are merged into feeds on read."""
+    return UserStats.objects.filter(
+        user_id=author_id, followers__gt=FEED_FANOUT_MAX_FOLLOWERS
+    ).exists()
+
+
+def _deliver(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=FEED_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out(post):
+    """Put a new post into the feed of every follower of its author."""
+    if is_celebrity(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _deliver(
+        FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in follower_ids.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Copy the latest posts of a newly followed author into the feed."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )[:FEED_BACKFILL_POSTS]
+    _deliver(
+        FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts
+    )
+
+
+def deliver_since(post_id, follow_id):
+    """Fan out posts and follows with ids above the given ones at once.
+
+    Bulk loads skip the signals calling fan_out() and backfill(), this
+    is the same done in one INSERT ... SELECT. A new follow gets every
+    post of the author, not only the latest FEED_BACKFILL_POSTS.
+    """
+    entries = FeedEntry._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {entries} (user_id, post_id, pub_date)
+            SELECT follow.user_id, post.id, post.pub_date
+            FROM {Follow._meta.db_table} AS follow
+            JOIN {Post._meta.db_table} AS post
+                ON post.author_id = follow.author_id
+            LEFT JOIN {UserStats._meta.db_table} AS stats
+                ON stats.user_id = follow.author_id
+            WHERE (post.id > %s OR follow.id > %s)
+                AND COALESCE(stats.followers, 0) <= %s
+            ON CONFLICT DO NOTHING
+        """, [post_id, follow_id, FEED_FANOUT_MAX_FOLLOWERS])
+
+
+def catch_up(author_id):
+    """Fan out the latest posts of an author who stopped being popular.
+
+    Posts published while the author had more than
+    FEED_FANOUT_MAX_FOLLOWERS followers were merged on read and never
+    delivered; without this they would drop out of the feeds. Like
+    backfill(), every follower gets at most FEED_BACKFILL_POSTS posts.
+    """
+    if not UserStats.objects.filter(
+        user_id=author_id, followers=FEED_FANOUT_MAX_FOLLOWERS
+    ).exists():
+        return
+    posts = Post._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {FeedEntry._meta.db_table} (user_id, post_id, pub_date)
+            SELECT follow.user_id, post.id, post.pub_date
+            FROM {Follow._meta.db_table} AS follow
+            JOIN {posts} AS post ON post.author_id = follow.author_id
+            WHERE follow.author_id = %s AND post.id IN (
+                SELECT id FROM {posts} WHERE author_id = %s
+                ORDER BY pub_date DESC LIMIT %s
+            )
+            ON CONFLICT DO NOTHING
+        """, [author_id, author_id, FEED_BACKFILL_POSTS])
+
+
+def schedule_catch_up(author_id):
+    """Run catch_up() after commit in the feed pool, not in the request."""
+    pool.after_commit(catch_up, author_id)
+
+
+def trim(user_id, author_id):
+    """Drop posts of an unfollowed author from the feed."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def follow_feed(user):
+    """Posts for follow_index: materialized feed plus popular authors."""
+    celebrity_ids = list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__followers__gt=FEED_FANOUT_MAX_FOLLOWERS,
+        ).values_list('author_id', flat=True)
+    )
+    posts = Post.objects.for_feed()
+    if not celebrity_ids:
+        # Диапазон по индексу (user, pub_date) таблицы ленты; дата и id
+        # записи ленты служат курсором, см. CursorPaginator
+        return posts.filter(feed_entries__user=user).annotate(
+            cursor_date=F('feed_entries__pub_date'),
+            cursor_pk=F('feed_entries__id'),
+        ).order_by('-cursor_date', '-cursor_pk')
+    # Без JOIN и DISTINCT: id из ленты по её индексу или посты популярных
+    # авторов по индексу (author, -pub_date), SQLite объединяет оба
+    # диапазона (MULTI-INDEX OR)
+    delivered = FeedEntry.objects.filter(user=user).values('post_id')
+    return posts.filter(
+        Q(pk__in=delivered) | Q(author_id__in=celebrity_ids)
+    ).order_by('-pub_date')
@@ -1,7 +1,9 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
-from .models import Comment, Post
+from .images import normalize_upload
+from .models import Comment, Group, Post
 
 
 class PostForm(ModelForm):
@@ -10,6 +12,12 @@ class PostForm(ModelForm):
         model = Post
         fields = ('group', 'text', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return normalize_upload(image)
+        return image
+
 
 class CommentForm(ModelForm):
 
@@ -19,3 +27,12 @@ class CommentForm(ModelForm):
         widgets = {
             'text': forms.Textarea(attrs={'cols': 30, 'rows': 5})
         }
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Что ищем', max_length=200, required=False)
+    group = forms.ModelChoiceField(
+        label='Группа', queryset=Group.objects.all(), to_field_name='slug',
+        required=False, empty_label='Все группы'
+    )
+    author = forms.CharField(label='Автор', max_length=150, required=False)
@@ -0,0 +1,86 @@
+"""Validators for conditional GET of pages and API responses.
+
+A response is described by a few cheap values and the card versions
+bumped on any post, group or author edit. A numbered page takes an
+aggregate over the queryset it shows (count and latest date), which its
+paginator needs anyway. A cursor page never counts: it is described by
+the rows of the page itself, fetched by one range read. When the client
+copy is current the view answers 304 without rendering anything.
+"""
+import datetime
+import hashlib
+from calendar import timegm
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .cards import last_change
+from .settings import PAGE_CACHE_MAX_AGE
+
+EDITABLE = ('post', 'group', 'user')
+
+
+def feed_aggregate(posts):
+    return posts.order_by().aggregate(
+        count=Count('pk'), last=Max('pub_date')
+    )
+
+
+def page_rows(page_obj):
+    """ETag parts and the latest date of a cursor page from its rows."""
+    parts = (
+        [post.pk for post in page_obj],
+        page_obj.has_next(),
+        page_obj.has_previous(),
+    )
+    return parts, max((post.pub_date for post in page_obj), default=None)
+
+
+def state(*parts, last=None):
+    """ETag and Last-Modified of a response built from the given data.
+
+    Edits never move the latest date, so both also depend on the time
+    of the latest post, group or author change.
+    """
+    changed = last_change(*EDITABLE)
+    etag = hashlib.sha1(repr((*parts, last, changed)).encode()).hexdigest()
+    modified = datetime.datetime.fromtimestamp(
+        changed / 10**9, tz=timezone.utc
+    )
+    return etag, max(last, modified) if last else modified
+
+
+def cache_control(request, response):
+    """Let guests share a page for a while, make users revalidate theirs.
+
+    A CDN may keep a guest page for PAGE_CACHE_MAX_AGE seconds.
+    """
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(
+            response, public=True, max_age=PAGE_CACHE_MAX_AGE
+        )
+
+
+def respond(request, etag, last_modified, build):
+    """Answer 304 if the client copy is current, otherwise call build().
+
+    Under the page cache the body is rendered for everyone at once, the
+    cache compares validators of the final page itself.
+    """
+    etag = quote_etag(etag)
+    last_modified = timegm(last_modified.utctimetuple())
+    response = None
+    if not getattr(request, 'punch_holes', False):
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+    if response is None:
+        response = build()
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    cache_control(request, response)
+    return response
@@ -0,0 +1,103 @@
+"""Per-user fragments of pages kept in the shared page cache.
+
+A cached page is rendered once for everybody; the parts depending on the
+visitor are left as markers and rendered on every request. Arguments of
+a hole are stored in the marker, so they must be plain JSON values.
+"""
+import base64
+import json
+import re
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import writebehind
+from .forms import CommentForm
+from .models import Follow
+
+HOLES = {}
+MARKER = re.compile(r'<!--hole ([A-Za-z0-9_=-]+)-->')
+
+
+def hole(name, template):
+    """Register a function building the context of a fragment."""
+    def register(func):
+        HOLES[name] = (template, func)
+        return func
+    return register
+
+
+@hole('header', 'includes/header.html')
+def header(request):
+    return {}
+
+
+@hole('switcher', 'posts/includes/switcher.html')
+def switcher(request):
+    return {}
+
+
+@hole('follow_button', 'posts/includes/follow_button.html')
+def follow_button(request, username):
+    following = False
+    if (request.user.is_authenticated
+            and request.user.username != username):
+        # Подписка или отписка ещё может ждать в очереди записи
+        following = writebehind.following(request.user, username)
+        if following is None:
+            following = Follow.objects.filter(
+                user=request.user, author__username=username
+            ).exists()
+    return {'username': username, 'following': following}
+
+
+@hole('comment_form', 'posts/includes/comment_form.html')
+def comment_form(request, post_id):
+    return {'post_id': post_id, 'form': CommentForm()}
+
+
+@hole('pending_comments', 'posts/includes/pending_comments.html')
+def pending_comments(request, post_id):
+    comments = writebehind.pending_comments(request.user, post_id)
+    # Тексты не попадают в ETag, число попадает
+    return {'comments': comments, 'count': len(comments)}
+
+
+@hole('edit_button', 'posts/includes/edit_button.html')
+def edit_button(request, post_id, author_id):
+    return {'post_id': post_id, 'is_author': request.user.pk == author_id}
+
+
+def render_hole(request, name, args):
+    template, context = HOLES[name]
+    return render_to_string(
+        template, context(request, *args), request=request
+    )
+
+
+def marker(name, args):
+    payload = json.dumps([name, *args]).encode()
+    return mark_safe(
+        f'<!--hole {base64.urlsafe_b64encode(payload).decode()}-->'
+    )
+
+
+def fill(request, content):
+    """Render every hole of a cached page for the current visitor.
+
+    Returns the page and the plain values its holes were built from.
+    Those stand for the holes in the ETag, as CSRF tokens are masked anew
+    on every render and two equal pages never match byte for byte.
+    """
+    used = []
+
+    def render(match):
+        name, *args = json.loads(base64.urlsafe_b64decode(match[1]))
+        template, build = HOLES[name]
+        context = build(request, *args)
+        used.append((name, args, sorted(
+            (key, value) for key, value in context.items()
+            if isinstance(value, (str, int, bool, type(None)))
+        )))
+        return render_to_string(template, context, request=request)
+    return MARKER.sub(render, content), used
@@ -0,0 +1,118 @@
+from io import BytesIO
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from PIL import Image, ImageOps
+from sorl.thumbnail import get_thumbnail
+
+from .settings import (IMAGE_FORMATS, IMAGE_MASTER_MAX_SIDE,
+                       IMAGE_MASTER_QUALITY, IMAGE_MAX_PIXELS,
+                       IMAGE_MAX_UPLOAD_BYTES, IMAGE_UPLOAD_FORMATS,
+                       IMAGE_VARIANTS)
+
+MIME_TYPES = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+
+
+def geometry(variant, width):
+    ratio_width, ratio_height = IMAGE_VARIANTS[variant]['ratio']
+    return f'{width}x{round(width * ratio_height / ratio_width)}'
+
+
+def thumbnail_specs():
+    """Every (geometry, options) pair the templates may ask for."""
+    for variant, spec in IMAGE_VARIANTS.items():
+        for width in spec['widths']:
+            for image_format in IMAGE_FORMATS:
+                yield geometry(variant, width), dict(
+                    spec['options'], format=image_format
+                )
+
+
+def _srcset(thumbs):
+    seen = {}
+    for thumb in thumbs:
+        seen.setdefault(thumb.url, thumb.width)
+    return ', '.join(f'{url} {width}w' for url, width in seen.items())
+
+
+def picture(image, variant):
+    """Data for a <picture> element with all widths and formats."""
+    spec = IMAGE_VARIANTS[variant]
+    sources = []
+    for image_format in IMAGE_FORMATS:
+        thumbs = {
+            width: get_thumbnail(
+                image, geometry(variant, width),
+                format=image_format, **spec['options']
+            )
+            for width in spec['widths']
+        }
+        sources.append({
+            'type': MIME_TYPES[image_format],
+            'srcset': _srcset(thumbs.values()),
+            'default': thumbs[spec['default']],
+        })
+    fallback = sources.pop()
+    return {
+        'sources': sources,
+        'srcset': fallback['srcset'],
+        'img': fallback['default'],
+        'sizes': spec['sizes'],
+    }
+
+
+def normalize_upload(upload):
+    """Check limits of an uploaded image and store a lean master copy.
+
+    The header is read first, so oversized images and formats outside
+    IMAGE_UPLOAD_FORMATS are rejected before decoding. JPEG is decoded
+    straight at a reduced scale, the picture is rotated by its EXIF
+    orientation, shrunk to IMAGE_MASTER_MAX_SIDE and saved again in its
+    own format without metadata.
+    """
+    if upload.size > IMAGE_MAX_UPLOAD_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.',
+            code='file_too_large',
+            params={'limit': IMAGE_MAX_UPLOAD_BYTES // (1024 * 1024)},
+        )
+    upload.seek(0)
+    image = Image.open(upload)
+    if image.format not in IMAGE_UPLOAD_FORMATS:
+        raise ValidationError(
+            'Формат %(format)s не поддерживается, загрузите %(allowed)s.',
+            code='unsupported_format',
+            params={
+                'format': image.format,
+                'allowed': ', '.join(IMAGE_UPLOAD_FORMATS),
+            },
+        )
+    width, height = image.size
+    if width * height > IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)d мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': IMAGE_MAX_PIXELS // 1_000_000},
+        )
+    if getattr(image, 'is_animated', False):
+        # Анимацию не пересобираем, чтобы не потерять кадры
+        upload.seek(0)
+        return upload
+    image_format = image.format
+    box = (IMAGE_MASTER_MAX_SIDE, IMAGE_MASTER_MAX_SIDE)
+    image.draft(None, box)
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(box)
+    options = {}
+    if image_format == 'JPEG':
+        options = {'quality': IMAGE_MASTER_QUALITY, 'optimize': True}
+    master = BytesIO()
+    image.save(master, format=image_format, **options)
+    return InMemoryUploadedFile(
+        master, 'image', upload.name, Image.MIME.get(image_format),
+        master.tell(), None,
+    )
@@ -0,0 +1,210 @@
+"""Synthetic data at a realistic shape for benchmarks.
+
+A few authors write most of the posts, a few posts get most of the
+comments and a few authors get most of the followers: all three are
+drawn from a Zipf distribution. Rows are written with bulk_create, so
+the generator ends like an NDJSON import, rebuilding the data signals
+keep (see posts/transfer.py). The routes to measure on such data and
+their url arguments come from here too, for the benchmark commands and
+the query budget tests alike.
+"""
+import datetime
+import itertools
+from array import array
+from importlib import import_module
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .transfer import bulk_insert, keep_dates, rebuild_derived, top_id
+
+# Разные формы одних слов, чтобы поиск без стемминга их пропускал
+VOCABULARY = (
+    'пост посты постов постами запись записи записей лента ленты ленте '
+    'подписка подписки подписчик подписчиков автор автора авторы группа '
+    'группы группе комментарий комментарии комментариев картинка '
+    'картинки программирование программировать программист программисты '
+    'питон питоне джанго база базы данных данные запрос запросы запросов '
+    'индекс индексы индексом кеш кеша кешировать страница страницы '
+    'быстрый быстрая быстрее медленный медленно красивый красивейший '
+    'новость новости новостями город города городе весна весной лето '
+    'летом осень осенью зима зимой море морем горы горах кошка кошки '
+    'собака собаки читать читал читала читали писать писал писала'
+).split()
+# Длинный хвост редких слов: без него каждое слово есть почти в каждом
+# посте, а LIKE никогда не просматривает таблицу целиком
+TAIL = [
+    ''.join(syllables) for syllables in itertools.product(
+        'ба ве ги до ку ла ме ни по ру са те фу ха цы ча шо щу эк юр'.split(),
+        repeat=3,
+    )
+]
+WORDS = [*VOCABULARY, *TAIL]
+# Посты и комментарии разбросаны по последнему году
+PERIOD = datetime.timedelta(days=365)
+URLCONFS = ('posts.urls', 'posts.api_urls', 'users.urls', 'about.urls')
+
+
+def zipf_weights(size, exponent=1.0):
+    """Cumulative weights for rng.choices, rank r drawn as 1 / r**s."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+def text(rng, weights, low, high):
+    return ' '.join(
+        rng.choices(WORDS, cum_weights=weights, k=rng.randint(low, high))
+    )
+
+
+def _batches(items, size):
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def generate(rng, users, groups, posts, comments, follows,
+             exponent=1.0, batch_size=1000, progress=None):
+    """Add the given number of rows of every kind, returns their counts.
+
+    Existing rows are left alone, so calling it again grows the data.
+    Authors, commented posts and followed authors come from the rows
+    added by this call.
+    """
+    progress = progress or (lambda kind, count: None)
+    last_post, last_follow = top_id(Post), top_id(Follow)
+    prefix = f'load{top_id(User) + 1}_'
+    password = make_password(None)
+    now = timezone.now()
+    word_weights = zipf_weights(len(WORDS), exponent)
+
+    def write(model, objects, kind, **kwargs):
+        written = 0
+        for batch in _batches(objects, batch_size):
+            with transaction.atomic(), keep_dates():
+                bulk_insert(model, batch, **kwargs)
+            written += len(batch)
+            progress(kind, written)
+            yield from batch
+
+    user_ids = array('q', (user.pk for user in write(User, (
+        User(username=f'{prefix}{i}', first_name='Автор', last_name=str(i),
+             password=password)
+        for i in range(users)
+    ), 'user')))
+    group_ids = array('q', (group.pk for group in write(Group, (
+        Group(title=f'Группа {prefix}{i}', slug=f'{prefix}{i}'.lower(),
+              description=text(rng, word_weights, 5, 20))
+        for i in range(groups)
+    ), 'group')))
+
+    author_weights = zipf_weights(users, exponent)
+    post_ids = array('q')
+    post_dates = array('d')
+
+    def new_post():
+        # Треть постов без группы
+        in_group = group_ids and rng.random() < 0.7
+        return Post(
+            author_id=rng.choices(user_ids, cum_weights=author_weights)[0],
+            group_id=rng.choice(group_ids) if in_group else None,
+            text=text(rng, word_weights, 10, 60),
+            pub_date=now - PERIOD * rng.random(),
+        )
+    for post in write(Post, (new_post() for _ in range(posts)), 'post'):
+        post_ids.append(post.pk)
+        post_dates.append(post.pub_date.timestamp())
+
+    post_weights = zipf_weights(len(post_ids), exponent)
+
+    def new_comment():
+        index = rng.choices(range(len(post_ids)), cum_weights=post_weights)[0]
+        published = post_dates[index]
+        created = published + (now.timestamp() - published) * rng.random()
+        return Comment(
+            post_id=post_ids[index],
+            author_id=rng.choice(user_ids),
+            text=text(rng, word_weights, 3, 20),
+            created=datetime.datetime.fromtimestamp(
+                created, tz=datetime.timezone.utc
+            ),
+        )
+    comments_written = sum(1 for _ in write(
+        Comment, (new_comment() for _ in range(comments if post_ids else 0)),
+        'comment',
+    ))
+
+    def new_follow():
+        user, author = rng.choice(user_ids), rng.choices(
+            user_ids, cum_weights=author_weights
+        )[0]
+        return Follow(user_id=user, author_id=author)
+    # Подписки на себя и повторы отбрасываются, поэтому их может выйти
+    # немного меньше запрошенного
+    for _ in write(Follow, (
+        obj for obj in (new_follow() for _ in range(follows))
+        if obj.user_id != obj.author_id
+    ), 'follow', ignore_conflicts=True):
+        pass
+
+    rebuild_derived(last_post, last_follow)
+    return {
+        'user': len(user_ids),
+        'group': len(group_ids),
+        'post': len(post_ids),
+        'comment': comments_written,
+        'follow': Follow.objects.filter(pk__gt=last_follow).count(),
+    }
+
+
+def routes():
+    """(name, url arguments) of every named route of the site apps."""
+    for module in URLCONFS:
+        urlconf = import_module(module)
+        for pattern in urlconf.urlpatterns:
+            yield (
+                f'{urlconf.app_name}:{pattern.name}',
+                list(pattern.pattern.converters),
+            )
+
+
+def scale(posts):
+    """Rows of every kind for a database with the given number of posts."""
+    users = max(10, posts // 20)
+    return {
+        'users': users,
+        'groups': max(2, users // 50),
+        'posts': posts,
+        'comments': posts * 2,
+        'follows': users * 10,
+    }
+
+
+def route_arguments():
+    """Reader and url arguments: the busiest post, group and author."""
+    reader = UserStats.objects.order_by('-following').first().user
+    author = UserStats.objects.order_by('-followers').first().user
+    post = Post.objects.annotate(
+        total=Count('comments')
+    ).order_by('-total').first()
+    group = Group.objects.annotate(
+        total=Count('posts')
+    ).order_by('-total').first()
+    return reader, {
+        'post_id': post.pk,
+        'slug': group.slug,
+        'username': author.username,
+        'uidb64': urlsafe_base64_encode(force_bytes(reader.pk)),
+        'token': default_token_generator.make_token(reader),
+        'format': 'ndjson',
+    }
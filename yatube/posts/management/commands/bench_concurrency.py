@@ -0,0 +1,183 @@
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import closing
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.replicas import copy_database
+from posts.models import Post
+
+User = get_user_model()
+
+# Без настроек из core/sqlite.py: так Django работает с SQLite сам
+BASELINE = {
+    'SQLITE_PRAGMAS': {},
+    'SQLITE_IMMEDIATE_TRANSACTIONS': False,
+}
+# Кеш страниц спрятал бы чтения базы, а кеш в памяти процесса не видит
+# записей других процессов
+OVERRIDES = {
+    'CACHES': {'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }},
+    'READ_REPLICAS': [],
+}
+
+
+def requests(role, post_id):
+    """(method, url, data) a worker of the role makes in turn."""
+    detail = reverse('posts:post_detail', kwargs={'post_id': post_id})
+    if role == 'writer':
+        return [
+            ('post', reverse('posts:post_create'), {'text': 'Нагрузка'}),
+            ('post', reverse('posts:add_comment', kwargs={
+                'post_id': post_id
+            }), {'text': 'Нагрузка'}),
+        ]
+    return [('get', reverse('posts:index'), None), ('get', detail, None)]
+
+
+def work(role, user_id, post_id, deadline, results):
+    """Worker process: make requests until the deadline, report latencies."""
+    latencies, errors = [], 0
+    # Ошибки считаются, трассировки django.request в выводе не нужны
+    logging.disable(logging.ERROR)
+    try:
+        client = Client()
+        client.force_login(User.objects.get(pk=user_id))
+        queue = requests(role, post_id)
+        number = 0
+        while time.time() < deadline:
+            method, url, data = queue[number % len(queue)]
+            number += 1
+            started = time.perf_counter()
+            try:
+                response = getattr(client, method)(url, data)
+            except OperationalError:
+                # database is locked
+                errors += 1
+                continue
+            if response.status_code >= 400:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+    except OperationalError:
+        errors += 1
+    finally:
+        connections.close_all()
+        results.put((role, latencies, errors))
+
+
+def p95(latencies):
+    if len(latencies) < 2:
+        return None
+    return round(statistics.quantiles(latencies, n=20)[-1], 2)
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует базу и нагружает копию процессами, которые пишут посты '
+        'и комментарии и читают ленту и страницу поста. Замеряет '
+        'пропускную способность без настроек SQLite и с ними '
+        '(SQLITE_PRAGMAS, SQLITE_IMMEDIATE_TRANSACTIONS, CONN_MAX_AGE). '
+        'Печатает JSON по строке на режим.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            help='Файл SQLite для копии, по умолчанию основная база.'
+        )
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument(
+            '--seconds', type=float, default=10,
+            help='Длительность замера каждого режима.'
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замер только для SQLite')
+        source = options['database'] or connection.settings_dict['NAME']
+        if not os.path.exists(source):
+            raise CommandError(f'Нет базы {source}, выполните migrate')
+        modes = (
+            ('baseline', BASELINE, 0),
+            ('tuned', {}, connection.settings_dict['CONN_MAX_AGE']),
+        )
+        for mode, overrides, max_age in modes:
+            with tempfile.TemporaryDirectory() as directory:
+                target = os.path.join(directory, 'bench.sqlite3')
+                copy_database(source, target)
+                if mode == 'baseline':
+                    # Режим WAL записан в самом файле
+                    with closing(sqlite3.connect(target)) as copy:
+                        copy.execute('PRAGMA journal_mode = DELETE')
+                row = self.run(
+                    target, max_age, {**OVERRIDES, **overrides}, options
+                )
+            self.stdout.write(json.dumps({'mode': mode, **row}))
+
+    def run(self, target, max_age, overrides, options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        connections.close_all()
+        saved = dict(connection.settings_dict)
+        connection.settings_dict.update(NAME=target, CONN_MAX_AGE=max_age)
+        # fork: процессы наследуют настройки и подключаются к копии
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        try:
+            with override_settings(**overrides):
+                user, _ = User.objects.get_or_create(
+                    username='bench_concurrency'
+                )
+                post = Post.objects.create(author=user, text='Нагрузка')
+                connections.close_all()
+                deadline = time.time() + options['seconds']
+                roles = (['writer'] * options['writers']
+                         + ['reader'] * options['readers'])
+                processes = [
+                    context.Process(target=work, args=(
+                        role, user.pk, post.pk, deadline, results
+                    ))
+                    for role in roles
+                ]
+                for process in processes:
+                    process.start()
+                reports = [results.get() for _ in processes]
+                for process in processes:
+                    process.join()
+        finally:
+            connections.close_all()
+            connection.settings_dict.clear()
+            connection.settings_dict.update(saved)
+        row = {
+            'writers': options['writers'],
+            'readers': options['readers'],
+            'seconds': options['seconds'],
+        }
+        for role, kind in (('writer', 'writes'), ('reader', 'reads')):
+            latencies = [
+                value for name, values, _ in reports if name == role
+                for value in values
+            ]
+            row[f'{kind}_per_second'] = round(
+                len(latencies) / options['seconds'], 1
+            )
+            row[f'{kind[:-1]}_errors'] = sum(
+                errors for name, _, errors in reports if name == role
+            )
+            row[f'{kind[:-1]}_p95_ms'] = p95(latencies)
+        return row
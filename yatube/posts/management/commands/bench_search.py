@@ -0,0 +1,84 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.loadgen import TAIL, WORDS, zipf_weights
+from posts.models import Post, User
+from posts.search import LikeBackend, backend
+from posts.settings import SEARCH_BATCH_SIZE
+
+QUERIES = ('постами', 'программисты', 'быстрый запрос', 'красив*',
+           'зимой горах', 'кешировать', TAIL[100], TAIL[4000])
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетический корпус постов в транзакции, которая потом '
+        'откатывается, и сравнивает время поиска по индексу и LIKE. '
+        'Печатает JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=1_000_000,
+            help='Сколько постов создать для замера.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз выполнить каждый запрос.'
+        )
+        parser.add_argument(
+            '--query', action='append', default=None,
+            help='Поисковый запрос, можно повторять.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def timed(self, search, query, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            found = search(query)
+        return (time.perf_counter() - started) / repeat * 1000, len(found)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Частоты слов по закону Ципфа, как в живых текстах
+        weights = zipf_weights(len(WORDS))
+        author = User.objects.create(username='bench_search_author')
+        started = time.perf_counter()
+        for start in range(0, options['posts'], SEARCH_BATCH_SIZE):
+            size = min(SEARCH_BATCH_SIZE, options['posts'] - start)
+            Post.objects.bulk_create(
+                Post(author=author, text=' '.join(rng.choices(
+                    WORDS, cum_weights=weights, k=rng.randint(10, 40)
+                )))
+                for _ in range(size)
+            )
+        generated = time.perf_counter() - started
+        started = time.perf_counter()
+        backend().rebuild()
+        self.stdout.write(json.dumps({
+            'posts': options['posts'],
+            'backend': type(backend()).__name__,
+            'generate_seconds': round(generated, 1),
+            'index_seconds': round(time.perf_counter() - started, 1),
+        }))
+        like = LikeBackend()
+        for query in options['query'] or QUERIES:
+            indexed_ms, found = self.timed(
+                backend().search, query, options['repeat']
+            )
+            like_ms, like_found = self.timed(
+                like.search, query, options['repeat']
+            )
+            self.stdout.write(json.dumps({
+                'query': query,
+                'backend_ms': round(indexed_ms, 2),
+                'backend_found': found,
+                'like_ms': round(like_ms, 2),
+                'like_found': like_found,
+            }, ensure_ascii=False))
+        transaction.set_rollback(True)
@@ -0,0 +1,136 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.loadgen import generate, route_arguments, routes, scale
+
+# Разница во времени меньше миллисекунды - шум, а не регрессия
+NOISE_MS = 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Для каждого размера базы создаёт синтетические данные в '
+        'транзакции, которая потом откатывается, и замеряет время и число '
+        'запросов каждого маршрута posts, api, users и about для гостя и '
+        'для пользователя. Печатает JSON по строке на замер.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1000,10000,100000',
+            help='Размеры базы в постах через запятую.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз открыть страницу с тёплым кешем.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--baseline',
+            help='Прошлый вывод команды: запросов стало больше или время '
+                 'выросло сильнее --tolerance - ошибка.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help='Допустимый рост времени, доля от прошлого.'
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        rows = []
+        with transaction.atomic():
+            rng = random.Random(options['seed'])
+            generated = 0
+            for size in sizes:
+                started = time.perf_counter()
+                generate(rng, **scale(size - generated))
+                generated = size
+                self.emit(rows, {
+                    'size': size,
+                    'generate_seconds': round(
+                        time.perf_counter() - started, 1
+                    ),
+                })
+                for row in self.bench(size, options['repeat']):
+                    self.emit(rows, row)
+            transaction.set_rollback(True)
+        cache.clear()
+        if options['baseline']:
+            self.compare(rows, options['baseline'], options['tolerance'])
+
+    def emit(self, rows, row):
+        rows.append(row)
+        self.stdout.write(json.dumps(row))
+
+    def bench(self, size, repeat):
+        reader, values = route_arguments()
+        guest, user = Client(), Client()
+        for name, params in routes():
+            url = reverse(name, kwargs={key: values[key] for key in params})
+            for role, client in (('guest', guest), ('user', user)):
+                yield {
+                    'size': size,
+                    'route': name,
+                    'client': role,
+                    **self.measure(client, url, repeat, reader, role),
+                }
+
+    def request(self, client, url, reader, role):
+        if role == 'user':
+            # logout выходит из сессии, входим перед каждым запросом
+            client.force_login(reader)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = (time.perf_counter() - started) * 1000
+        return response, len(queries), elapsed
+
+    def measure(self, client, url, repeat, reader, role):
+        cache.clear()
+        response, queries, cold_ms = self.request(client, url, reader, role)
+        warm = [
+            self.request(client, url, reader, role)
+            for _ in range(repeat)
+        ]
+        return {
+            'url': url,
+            'status': response.status_code,
+            'queries': queries,
+            'cold_ms': round(cold_ms, 2),
+            'warm_queries': max(queries for _, queries, _ in warm),
+            'warm_ms': round(statistics.median(
+                elapsed for _, _, elapsed in warm
+            ), 2),
+        }
+
+    def compare(self, rows, path, tolerance):
+        with open(path, encoding='utf-8') as baseline:
+            previous = {
+                (row['size'], row['route'], row['client']): row
+                for row in map(json.loads, baseline) if 'route' in row
+            }
+        failed = 0
+        for row in rows:
+            old = previous.get(
+                (row['size'], row.get('route'), row.get('client'))
+            )
+            if old is None:
+                continue
+            slower = row['warm_ms'] > max(
+                old['warm_ms'] * (1 + tolerance), old['warm_ms'] + NOISE_MS
+            )
+            if (row['queries'] > old['queries']
+                    or row['warm_queries'] > old['warm_queries'] or slower):
+                failed += 1
+                self.stderr.write(json.dumps({'was': old, 'now': row}))
+        if failed:
+            raise CommandError(f'Регрессий по сравнению с {path}: {failed}')
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает планы и время горячих запросов лент. Запустите до и '
+        'после migrate, чтобы сравнить работу индексов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз выполнить каждый запрос для замера времени.'
+        )
+
+    def hot_queries(self):
+        user = User.objects.order_by('pk').first()
+        group = Group.objects.order_by('pk').first()
+        post = Post.objects.order_by('pk').first()
+        user_id = user.pk if user else 0
+        yield 'index', Post.objects.for_feed()[:10]
+        yield 'group_posts', Post.objects.for_feed().filter(
+            group_id=group.pk if group else 0
+        )[:10]
+        yield 'profile', Post.objects.for_feed().filter(
+            author_id=user_id
+        )[:10]
+        yield 'post_detail comments', Comment.objects.filter(
+            post_id=post.pk if post else 0
+        )
+        yield 'profile_follow lookup', Follow.objects.filter(
+            user_id=user_id, author_id=user_id
+        )
+
+    def handle(self, *args, **options):
+        for name, queryset in self.hot_queries():
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - started) / options['repeat']
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{name}: {elapsed * 1000:.2f} ms'
+            ))
+            self.stdout.write(queryset.explain())
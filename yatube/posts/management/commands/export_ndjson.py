@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from posts.settings import TRANSFER_BATCH_SIZE
+from posts.transfer import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в NDJSON, по одной записи в строке. Картинки не копируются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл дампа, по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=TRANSFER_BATCH_SIZE,
+            help='Сколько строк читать из базы за раз.'
+        )
+
+    def handle(self, *args, **options):
+        def progress(kind, count):
+            self.stderr.write(f'{kind}: {count}')
+
+        if options['path'] == '-':
+            counts = export(self.stdout.write, options['batch_size'], progress)
+        else:
+            with open(options['path'], 'w', encoding='utf-8') as dump:
+                counts = export(
+                    lambda line: dump.write(line + '\n'),
+                    options['batch_size'], progress,
+                )
+        total = ', '.join(f'{kind}: {count}' for kind, count in counts.items())
+        # В stdout может идти сам дамп
+        out = self.stderr if options['path'] == '-' else self.stdout
+        out.write(self.style.SUCCESS(f'Выгружено {total}'))
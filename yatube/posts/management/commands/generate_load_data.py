@@ -0,0 +1,50 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.loadgen import generate
+
+
+class Command(BaseCommand):
+    help = (
+        'Добавляет синтетических пользователей, группы, посты, комментарии '
+        'и подписки. Авторство, комментарии и подписчики распределены по '
+        'закону Ципфа. Печатает JSON с числом созданных строк.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20_000)
+        parser.add_argument('--comments', type=int, default=40_000)
+        parser.add_argument('--follows', type=int, default=20_000)
+        parser.add_argument(
+            '--exponent', type=float, default=1.0,
+            help='Показатель закона Ципфа: чем больше, тем сильнее '
+                 'выделяются популярные авторы и посты.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь')
+        started = time.perf_counter()
+        counts = generate(
+            random.Random(options['seed']),
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            exponent=options['exponent'],
+            batch_size=options['batch_size'],
+            progress=lambda kind, count: self.stderr.write(
+                f'{kind}: {count}'
+            ),
+        )
+        self.stdout.write(json.dumps({
+            **counts, 'seconds': round(time.perf_counter() - started, 1),
+        }))
@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.settings import TRANSFER_BATCH_SIZE
+from posts.transfer import Importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает дамп export_ndjson. Пользователи и группы ищутся по '
+        'имени и slug, посты и комментарии добавляются заново, поэтому '
+        'повторная загрузка того же дампа их продублирует.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл дампа, по умолчанию stdin.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=TRANSFER_BATCH_SIZE,
+            help='Сколько строк записывать одной транзакцией.'
+        )
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересчитывать счётчики, ленты и поисковый индекс, '
+                 'например перед загрузкой следующего дампа.'
+        )
+
+    def handle(self, *args, **options):
+        importer = Importer(
+            options['batch_size'],
+            lambda kind, count: self.stderr.write(f'{kind}: {count}'),
+        )
+        if options['path'] == '-':
+            self.load(importer, sys.stdin)
+        else:
+            with open(options['path'], encoding='utf-8') as dump:
+                self.load(importer, dump)
+        counts = importer.finish(rebuild=not options['no_rebuild'])
+        total = ', '.join(f'{kind}: {count}' for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Загружено {total}'))
+
+    def load(self, importer, dump):
+        for number, line in enumerate(dump, 1):
+            try:
+                importer.feed(line)
+            except ValueError as error:
+                raise CommandError(f'Строка {number}: {error}')
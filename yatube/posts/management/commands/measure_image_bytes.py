@@ -0,0 +1,88 @@
+import json
+
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import get_thumbnail
+
+from posts.images import geometry
+from posts.models import Post
+from posts.settings import IMAGE_FORMATS, IMAGE_VARIANTS, POSTS_PER_PAGE
+
+# Одна миниатюра JPEG на шаблон, как было до {% picture %}
+LEGACY = {
+    'card': ('100x100', {'crop': 'center'}),
+    'detail': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Ширина слота картинки в CSS-пикселях при заданной ширине экрана
+SLOTS = {
+    'card': lambda viewport: 100,
+    'detail': lambda viewport: min(viewport, 960),
+}
+
+
+def thumb_bytes(thumb):
+    return thumb.storage.size(thumb.name)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает объём картинок на странице ленты и поста: одна JPEG '
+        'миниатюра против выбора браузера из srcset. Печатает JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--screen', action='append', default=None,
+            help='Экран как ШИРИНАxDPR, например 375x2. Можно повторять.'
+        )
+
+    def picked(self, image, variant, viewport, dpr):
+        """Thumbnail a browser would take from srcset for the slot."""
+        spec = IMAGE_VARIANTS[variant]
+        needed = SLOTS[variant](viewport) * dpr
+        width = next(
+            (width for width in spec['widths'] if width >= needed),
+            spec['widths'][-1],
+        )
+        return get_thumbnail(
+            image, geometry(variant, width),
+            format=IMAGE_FORMATS[0], **spec['options']
+        )
+
+    def handle(self, *args, **options):
+        screens = [
+            tuple(int(part) for part in screen.split('x'))
+            for screen in options['screen'] or ['375x2', '768x2', '1440x1']
+        ]
+        images = [
+            post.image for post in Post.objects.exclude(image='').exclude(
+                image__isnull=True
+            ).only('image')[:POSTS_PER_PAGE]
+        ]
+        for viewport, dpr in screens:
+            result = {
+                'viewport': viewport,
+                'dpr': dpr,
+                'images': len(images),
+            }
+            for variant, page in (('card', 'feed_page'),
+                                  ('detail', 'post_detail')):
+                geometry_, legacy_options = LEGACY[variant]
+                legacy = sum(
+                    thumb_bytes(get_thumbnail(
+                        image, geometry_, **legacy_options
+                    ))
+                    for image in images
+                )
+                responsive = sum(
+                    thumb_bytes(self.picked(image, variant, viewport, dpr))
+                    for image in images
+                )
+                if variant == 'detail' and images:
+                    # На странице поста одна картинка: берём среднее
+                    legacy //= len(images)
+                    responsive //= len(images)
+                result[page] = {
+                    'legacy_bytes': legacy,
+                    'responsive_bytes': responsive,
+                }
+            self.stdout.write(json.dumps(result))
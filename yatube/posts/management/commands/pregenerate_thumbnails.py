@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import Post
+from posts.thumbnails import pregenerate
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для всех картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Число потоков, обрабатывающих картинки.'
+        )
+
+    def handle(self, *args, **options):
+        images = (
+            post.image for post in Post.objects.exclude(image='').exclude(
+                image__isnull=True
+            ).only('image').iterator()
+        )
+        done = failed = 0
+        if options['workers'] > 1:
+            pool = ThreadPoolExecutor(max_workers=options['workers'])
+            results = pool.map(self.process, images)
+        else:
+            pool = None
+            results = map(self.process, images)
+        for ok in results:
+            done += ok
+            failed += not ok
+        if pool is not None:
+            pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {done}, с ошибками: {failed}'
+        ))
+
+    def process(self, image):
+        try:
+            pregenerate(image)
+        except Exception as error:
+            self.stderr.write(f'{image.name}: {error}')
+            return False
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+        return True
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.stats import rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def handle(self, *args, **options):
+        written = rebuild_all()
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитана статистика {written} польз.')
+        )
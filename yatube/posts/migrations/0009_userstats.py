@@ -0,0 +1,62 @@
+# Generated by Django 2.2.16 on 2026-10-17 03:55
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_user_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    def group_counts(model, key):
+        return dict(
+            model.objects.values_list(key).annotate(total=Count('pk'))
+            .order_by()
+        )
+
+    posts = group_counts(Post, 'author_id')
+    comments = group_counts(Comment, 'author_id')
+    followers = group_counts(Follow, 'author_id')
+    following = group_counts(Follow, 'user_id')
+    UserStats.objects.bulk_create(
+        UserStats(
+            user_id=user_id,
+            posts=posts.get(user_id, 0),
+            comments=comments.get(user_id, 0),
+            followers=followers.get(user_id, 0),
+            following=following.get(user_id, 0),
+        )
+        for user_id in User.objects.values_list('pk', flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0008_follow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts', models.PositiveIntegerField(default=0, verbose_name='постов')),
+                ('comments', models.PositiveIntegerField(default=0, verbose_name='комментариев')),
+                ('followers', models.PositiveIntegerField(default=0, verbose_name='подписчиков')),
+                ('following', models.PositiveIntegerField(default=0, verbose_name='подписок')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+            ],
+            options={
+                'verbose_name': 'Статистика пользователя',
+                'verbose_name_plural': 'Статистика пользователей',
+            },
+        ),
+        migrations.RunPython(fill_user_stats, migrations.RunPython.noop),
+    ]
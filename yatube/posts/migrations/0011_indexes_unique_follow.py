@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-17 03:57
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def dedupe_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    duplicates = (
+        Follow.objects.values('user_id', 'author_id')
+        .annotate(first_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    touched = set()
+    for row in duplicates.iterator():
+        Follow.objects.filter(
+            user_id=row['user_id'], author_id=row['author_id']
+        ).exclude(id=row['first_id']).delete()
+        touched.update((row['user_id'], row['author_id']))
+    # Исторические модели не шлют сигналы, счётчики правим сами
+    for user_id in touched:
+        UserStats.objects.filter(user_id=user_id).update(
+            followers=Follow.objects.filter(author_id=user_id).count(),
+            following=Follow.objects.filter(user_id=user_id).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_feedentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_follows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date'], name='post_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date'], name='post_group_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
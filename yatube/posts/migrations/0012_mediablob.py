@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:10
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def count_refs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    MediaBlob = apps.get_model('posts', 'MediaBlob')
+    refs = (
+        Post.objects.exclude(image='').exclude(image__isnull=True)
+        .values_list('image').annotate(total=Count('pk')).order_by()
+    )
+    MediaBlob.objects.bulk_create(
+        MediaBlob(name=name, refs=total) for name, total in refs
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_indexes_unique_follow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='файл')),
+                ('refs', models.PositiveIntegerField(default=0, verbose_name='ссылок')),
+            ],
+            options={
+                'verbose_name': 'Файл',
+                'verbose_name_plural': 'Файлы',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(count_refs, migrations.RunPython.noop),
+    ]
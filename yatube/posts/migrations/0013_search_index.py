@@ -0,0 +1,62 @@
+from django.db import migrations
+
+from posts.stemmer import stem_text
+
+BATCH_SIZE = 1000
+
+
+def fill(cursor, sql, rows):
+    batch = []
+    for pk, text, *rest in rows.order_by('pk').iterator():
+        batch.append((pk, stem_text(text), *rest))
+        if len(batch) == BATCH_SIZE:
+            cursor.executemany(sql, batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+
+
+def create_index(apps, schema_editor):
+    # FTS5 есть только в SQLite, на других базах поиск работает через LIKE
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+            "body, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(
+            'CREATE VIRTUAL TABLE posts_comment_fts USING fts5('
+            "body, post_id UNINDEXED, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        fill(
+            cursor, 'INSERT INTO posts_post_fts (rowid, body) VALUES (%s, %s)',
+            Post.objects.values_list('pk', 'text'),
+        )
+        fill(
+            cursor, 'INSERT INTO posts_comment_fts (rowid, body, post_id) '
+            'VALUES (%s, %s, %s)',
+            Comment.objects.values_list('pk', 'text', 'post_id'),
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS posts_post_fts')
+        cursor.execute('DROP TABLE IF EXISTS posts_comment_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_mediablob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
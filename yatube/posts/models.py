@@ -1,10 +1,28 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+
+    def for_feed(self):
+        """Load everything includes/post.html needs in one query."""
+        return self.select_related('author', 'group').only(
+            'text',
+            'pub_date',
+            'image',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'group__title',
+            'group__slug',
+        )
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
@@ -26,14 +44,28 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date'], name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date'], name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -84,6 +116,11 @@ class Comment(models.Model):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created'], name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -108,3 +145,79 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписчик'
         verbose_name_plural = 'Подписчики'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Denormalized counters of a user, kept up to date by posts.signals."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='пользователь'
+    )
+    posts = models.PositiveIntegerField('постов', default=0)
+    comments = models.PositiveIntegerField('комментариев', default=0)
+    followers = models.PositiveIntegerField('подписчиков', default=0)
+    following = models.PositiveIntegerField('подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class FeedEntry(models.Model):
+    """Post delivered to the follow feed of a user (fan-out on write)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='пост'
+    )
+    pub_date = models.DateTimeField('дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'
+            ),
+        ]
+        indexes = [
+            # По возрастанию: SQLite читает индекс с конца, и порядок
+            # (pub_date, id) курсорной ленты весь берётся из индекса
+            models.Index(
+                fields=['user', 'pub_date'], name='feed_user_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} <- {self.post_id}'
+
+
+class MediaBlob(models.Model):
+    """Stored upload shared by every post with the same image."""
+    name = models.CharField('файл', max_length=255, unique=True)
+    refs = models.PositiveIntegerField('ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self):
+        return self.name
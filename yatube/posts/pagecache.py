@@ -0,0 +1,111 @@
+"""Whole pages shared by every visitor, with per-user holes.
+
+A page is cached under its path and query together with the versions it
+was rendered with: of all posts, groups and authors, and for the post
+page also of the comments of that post. Any change of those bumps a
+version (see posts/cards.py), so the next request renders the page
+again, while a comment leaves the feeds and other posts cached. Parts
+depending on the visitor are holes, see posts/holes.py.
+"""
+import hashlib
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe, quote_etag
+
+from .cards import VERSION_KEY, current, kind_keys
+from .freshness import cache_control
+from .holes import fill
+from .settings import PAGE_CACHE_TIMEOUT
+
+FEED_KINDS = ('post', 'group', 'user')
+PAGE_KEY = 'page:{}'
+
+
+def feed_versions(request, **kwargs):
+    """Version keys of a page listing post cards."""
+    return kind_keys(FEED_KINDS)
+
+
+def post_versions(request, post_id):
+    """Version keys of a post page: the cards and its own comments."""
+    return [*kind_keys(FEED_KINDS), VERSION_KEY.format('comment', post_id)]
+
+
+def page_key(request):
+    path = request.get_full_path().encode()
+    return PAGE_KEY.format(hashlib.sha1(path).hexdigest())
+
+
+def cached_page(view=None, *, keys=feed_versions):
+    """Serve the view from the shared page cache, filling its holes.
+
+    keys(request, **kwargs) names the version keys the page depends on,
+    feed_versions by default.
+    """
+    if view is None:
+        return partial(cached_page, keys=keys)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        key = page_key(request)
+        version_keys = keys(request, **kwargs)
+        found = cache.get_many([key, *version_keys])
+        versions = current(version_keys, found)
+        entry = found.get(key)
+        if entry is not None and entry['versions'] == versions:
+            response = HttpResponse(
+                entry['content'], content_type=entry['content_type']
+            )
+            if entry['last_modified']:
+                response['Last-Modified'] = entry['last_modified']
+        else:
+            request.punch_holes = True
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                request.punch_holes = False
+            if response.status_code != 200 or response.streaming:
+                return response
+            # Версии прочитаны до рендера: если что-то поменялось во время
+            # него, следующий запрос отрисует страницу заново. Реплика могла
+            # ещё не получить изменение, от которого версии уже выросли,
+            # поэтому страница с реплики живёт недолго
+            timeout = PAGE_CACHE_TIMEOUT
+            if getattr(request, 'from_replica', False):
+                timeout = settings.REPLICA_PIN_SECONDS
+            cache.set(key, {
+                'versions': versions,
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'last_modified': response.get('Last-Modified'),
+            }, timeout)
+        return personalize(request, response)
+    return wrapper
+
+
+def personalize(request, response):
+    """Fill the holes of a shared page and answer conditional GET."""
+    page = response.content
+    response.content, used = fill(request, page.decode(response.charset))
+    etag = quote_etag(hashlib.sha1(repr((
+        hashlib.sha1(page).hexdigest(), used, request.user.pk,
+        request.user.get_username(), request.META.get('CSRF_COOKIE'),
+    )).encode()).hexdigest())
+    response['ETag'] = etag
+    last_modified = None
+    if request.user.is_authenticated:
+        # Дырки меняются без новых постов, дата тут ничего не говорит
+        del response['Last-Modified']
+    elif response.has_header('Last-Modified'):
+        last_modified = parse_http_date_safe(response['Last-Modified'])
+    cache_control(request, response)
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified,
+        response=response,
+    )
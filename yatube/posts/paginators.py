@@ -0,0 +1,140 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+FORWARD = 'n'
+BACKWARD = 'p'
+# Больший id не влезает в INTEGER SQLite
+MAX_PK = 2 ** 63 - 1
+
+
+def encode_cursor(obj, direction=FORWARD, field='pub_date', key='pk'):
+    """Pack (date, id) of an object into an opaque url-safe token."""
+    raw = (
+        f'{direction}|{getattr(obj, field).isoformat()}|{getattr(obj, key)}'
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (direction, date, pk) or None for a malformed token."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or pub_date is None:
+        return None
+    if not 0 < pk <= MAX_PK:
+        return None
+    return direction, pub_date, pk
+
+
+class CursorPage(Page):
+    """Page of a keyset paginated list, it never asks for the total count."""
+
+    # Шаблон навигации отличает курсорную страницу от нумерованной
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage {self.previous_cursor}:{self.next_cursor}>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return ''
+        return encode_cursor(
+            self.object_list[-1], FORWARD, self.paginator.field,
+            self.paginator.key,
+        )
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return ''
+        return encode_cursor(
+            self.object_list[0], BACKWARD, self.paginator.field,
+            self.paginator.key,
+        )
+
+
+class CursorPaginator(Paginator):
+    """Paginate by (date, id) instead of OFFSET and COUNT(*).
+
+    Every page is a range scan starting right after the cursor, so deep
+    pages cost the same as the first one. Posts go by pub_date, comments
+    by created. A queryset annotated with cursor_date and cursor_pk goes by
+    them instead, this way the follow feed pages by its own table.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date'):
+        key = 'pk'
+        if 'cursor_date' in object_list.query.annotations:
+            field, key = 'cursor_date', 'cursor_pk'
+        super().__init__(
+            object_list.order_by(f'-{field}', f'-{key}'), per_page
+        )
+        self.field = field
+        self.key = key
+
+    def page(self, cursor):
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            rows = list(self.object_list[:self.per_page + 1])
+            return CursorPage(
+                rows[:self.per_page], self,
+                has_next=len(rows) > self.per_page,
+                has_previous=False,
+            )
+        direction, date, pk = decoded
+        if direction == FORWARD:
+            rows = list(
+                self.object_list.filter(
+                    Q(**{f'{self.field}__lt': date})
+                    | Q(**{self.field: date, f'{self.key}__lt': pk})
+                )[:self.per_page + 1]
+            )
+            if not rows:
+                # Посты после курсора удалили
+                return self.page(None)
+            return CursorPage(
+                rows[:self.per_page], self,
+                has_next=len(rows) > self.per_page,
+                has_previous=True,
+            )
+        rows = list(
+            self.object_list.filter(
+                Q(**{f'{self.field}__gt': date})
+                | Q(**{self.field: date, f'{self.key}__gt': pk})
+            ).reverse()[:self.per_page + 1]
+        )
+        if not rows:
+            return self.page(None)
+        return CursorPage(
+            rows[:self.per_page][::-1], self,
+            has_next=True,
+            has_previous=len(rows) > self.per_page,
+        )
+
+    def get_page(self, cursor):
+        return self.page(cursor)
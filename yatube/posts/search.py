@@ -0,0 +1,215 @@
+import functools
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Comment, Post
+from .settings import (SEARCH_BACKEND, SEARCH_BATCH_SIZE,
+                       SEARCH_COMMENT_WEIGHT, SEARCH_MAX_RESULTS,
+                       SEARCH_RANK_WINDOW)
+from .stemmer import stem, stem_text
+
+POST_TABLE = 'posts_post_fts'
+COMMENT_TABLE = 'posts_comment_fts'
+TERM = re.compile(r'(\w+)(\*?)')
+
+
+def parse_query(query):
+    """Split a query into (stem, is_prefix) terms; 'word*' is a prefix."""
+    return [
+        (stem(word), bool(star)) for word, star in TERM.findall(query)
+    ]
+
+
+class SearchBackend:
+    """Interface of a post search backend.
+
+    Signals keep the index in sync, search() returns ids of the matching
+    posts best first. A comment matching the query brings its post.
+    """
+
+    def index_post(self, post):
+        raise NotImplementedError
+
+    def remove_post(self, post_id):
+        raise NotImplementedError
+
+    def index_comment(self, comment):
+        raise NotImplementedError
+
+    def remove_comment(self, comment_id):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def search(self, query, group_id=None, author_id=None,
+               limit=SEARCH_MAX_RESULTS):
+        raise NotImplementedError
+
+
+class LikeBackend(SearchBackend):
+    """LIKE scans over posts and comments, for databases without FTS5.
+
+    Every term has to be found in the post or in one of its comments,
+    the newest posts come first.
+    """
+
+    def index_post(self, post):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def index_comment(self, comment):
+        pass
+
+    def remove_comment(self, comment_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, group_id=None, author_id=None,
+               limit=SEARCH_MAX_RESULTS):
+        terms = parse_query(query)
+        if not terms:
+            return []
+        posts = Post.objects.all()
+        for term, _ in terms:
+            posts = posts.filter(
+                Q(text__icontains=term) | Q(comments__text__icontains=term)
+            )
+        if group_id is not None:
+            posts = posts.filter(group_id=group_id)
+        if author_id is not None:
+            posts = posts.filter(author_id=author_id)
+        return list(posts.distinct().order_by(
+            '-pub_date', '-pk'
+        ).values_list('pk', flat=True)[:limit])
+
+
+class Fts5Backend(SearchBackend):
+    """Inverted index in SQLite FTS5 tables filled with stemmed texts.
+
+    Rowid of posts_post_fts is the post id and rowid of
+    posts_comment_fts is the comment id, so every update touches one row
+    by its key. Results are ranked by bm25, a match in a comment weighs
+    SEARCH_COMMENT_WEIGHT of a match in the post itself. Only the newest
+    SEARCH_RANK_WINDOW matches of each table are ranked, which bounds the
+    cost of a query by a word found in almost every post.
+    """
+
+    def index_post(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {POST_TABLE} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {POST_TABLE} (rowid, body) VALUES (%s, %s)',
+                [post.pk, stem_text(post.text)],
+            )
+
+    def remove_post(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {POST_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+    def index_comment(self, comment):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {COMMENT_TABLE} WHERE rowid = %s', [comment.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {COMMENT_TABLE} (rowid, body, post_id) '
+                f'VALUES (%s, %s, %s)',
+                [comment.pk, stem_text(comment.text), comment.post_id],
+            )
+
+    def remove_comment(self, comment_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {COMMENT_TABLE} WHERE rowid = %s', [comment_id]
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {POST_TABLE}')
+            cursor.execute(f'DELETE FROM {COMMENT_TABLE}')
+            self._fill(
+                cursor, f'INSERT INTO {POST_TABLE} (rowid, body) '
+                f'VALUES (%s, %s)',
+                Post.objects.values_list('pk', 'text'),
+            )
+            self._fill(
+                cursor, f'INSERT INTO {COMMENT_TABLE} (rowid, body, post_id) '
+                f'VALUES (%s, %s, %s)',
+                Comment.objects.values_list('pk', 'text', 'post_id'),
+            )
+            cursor.execute(
+                f"INSERT INTO {POST_TABLE} ({POST_TABLE}) VALUES ('optimize')"
+            )
+            cursor.execute(
+                f"INSERT INTO {COMMENT_TABLE} ({COMMENT_TABLE}) "
+                f"VALUES ('optimize')"
+            )
+
+    def _fill(self, cursor, sql, rows):
+        batch = []
+        for pk, text, *rest in rows.order_by('pk').iterator():
+            batch.append((pk, stem_text(text), *rest))
+            if len(batch) == SEARCH_BATCH_SIZE:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+
+    def search(self, query, group_id=None, author_id=None,
+               limit=SEARCH_MAX_RESULTS):
+        terms = parse_query(query)
+        if not terms:
+            return []
+        match = ' '.join(
+            f'"{term}"*' if prefix else f'"{term}"' for term, prefix in terms
+        )
+        filters, filter_params = [], []
+        if group_id is not None:
+            filters.append('AND post.group_id = %s')
+            filter_params.append(group_id)
+        if author_id is not None:
+            filters.append('AND post.author_id = %s')
+            filter_params.append(author_id)
+        hits, params = [], []
+        for table, post_id, weight in (
+            (POST_TABLE, 'hit.rowid', 1),
+            (COMMENT_TABLE, 'hit.post_id', SEARCH_COMMENT_WEIGHT),
+        ):
+            # Ранжируем только самые новые совпадения: по rowid FTS5
+            # идёт без сортировки, и частое слово не заставляет считать
+            # bm25 для всей таблицы
+            hits.append(
+                f'SELECT * FROM ('
+                f'SELECT {post_id} AS post_id, bm25({table}) * %s AS score'
+                f' FROM {table} AS hit'
+                f' JOIN {Post._meta.db_table} AS post ON post.id = {post_id}'
+                f' WHERE {table} MATCH %s {" ".join(filters)}'
+                f' ORDER BY hit.rowid DESC LIMIT %s)'
+            )
+            params += [weight, match, *filter_params, SEARCH_RANK_WINDOW]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id FROM ({" UNION ALL ".join(hits)})'
+                f' GROUP BY post_id ORDER BY MIN(score), post_id DESC'
+                f' LIMIT %s',
+                [*params, limit],
+            )
+            return [post_id for post_id, in cursor.fetchall()]
+
+
+@functools.lru_cache(maxsize=None)
+def backend():
+    """Backend configured by SEARCH_BACKEND."""
+    return import_string(SEARCH_BACKEND)()
@@ -1 +1,61 @@
 POSTS_PER_PAGE = 10
+# Комментарии на странице поста показываются порциями, остальные
+# подгружаются по курсору
+COMMENTS_PER_PAGE = 20
+# Авторы с большим числом подписчиков не раскладываются по лентам
+# при публикации, их посты подмешиваются в ленту при чтении
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+# Сколько последних постов автора попадает в ленту при подписке
+FEED_BACKFILL_POSTS = 1000
+FEED_BATCH_SIZE = 1000
+# Варианты картинок для {% picture %}: каждая ширина создаётся в каждом
+# формате, последний формат - запасной для <img>. Все миниатюры
+# создаются заранее при сохранении поста с картинкой
+IMAGE_FORMATS = ('WEBP', 'JPEG')
+IMAGE_VARIANTS = {
+    'card': {
+        'ratio': (1, 1),
+        'widths': (100, 200),
+        'default': 100,
+        'sizes': '100px',
+        'options': {'crop': 'center'},
+    },
+    'detail': {
+        'ratio': (960, 339),
+        'widths': (480, 960, 1440),
+        'default': 960,
+        'sizes': '(max-width: 960px) 100vw, 960px',
+        'options': {'crop': 'center', 'upscale': True},
+    },
+}
+# Ограничения загружаемых картинок: больше IMAGE_MAX_UPLOAD_BYTES или
+# IMAGE_MAX_PIXELS не принимаем, стороны длиннее IMAGE_MASTER_MAX_SIDE
+# уменьшаем, метаданные при пересохранении отбрасываются. Принимаем
+# только форматы из IMAGE_UPLOAD_FORMATS: остальные Pillow часто умеет
+# читать, но не записывать
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+IMAGE_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 50_000_000
+IMAGE_MASTER_MAX_SIDE = 2048
+IMAGE_MASTER_QUALITY = 85
+# Поиск: класс бэкенда, сколько найденных постов показываем, среди
+# скольких самых новых совпадений выбираем лучшие, вес совпадения
+# в комментарии относительно совпадения в самом посте
+SEARCH_BACKEND = 'posts.search.Fts5Backend'
+SEARCH_MAX_RESULTS = 1000
+SEARCH_RANK_WINDOW = 10_000
+SEARCH_COMMENT_WEIGHT = 0.5
+SEARCH_BATCH_SIZE = 1000
+# Сколько секунд гости и CDN могут показывать страницу ленты или поста
+# без перепроверки; страницы вошедших пользователей всегда
+# перепроверяются по ETag
+PAGE_CACHE_MAX_AGE = 10
+# Сколько секунд хранится отрисованная страница в общем кеше страниц;
+# правки сбрасывают её раньше через версии
+PAGE_CACHE_TIMEOUT = 60 * 60
+# Сколько строк дампа пишется одной транзакцией при импорте и читается
+# из базы за раз при экспорте
+TRANSFER_BATCH_SIZE = 5000
+# Сколько символов копится перед отправкой очередного куска
+# потоковой выгрузки
+EXPORT_CHUNK_CHARS = 64 * 1024
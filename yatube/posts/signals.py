@@ -0,0 +1,121 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import blobs, cards, feed, search, thumbnails
+from .models import Comment, Follow, Group, Post, User
+from .stats import bump
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        bump(instance.author_id, 'posts', 1)
+        feed.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump(instance.author_id, 'posts', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        bump(instance.author_id, 'comments', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump(instance.author_id, 'comments', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        bump(instance.user_id, 'following', 1)
+        bump(instance.author_id, 'followers', 1)
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump(instance.user_id, 'following', -1)
+    bump(instance.author_id, 'followers', -1)
+    feed.trim(instance.user_id, instance.author_id)
+    feed.schedule_catch_up(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_card_changed(sender, instance, **kwargs):
+    cards.bump('post', instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def post_comments_changed(sender, instance, **kwargs):
+    cards.bump('comment', instance.post_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_card_changed(sender, instance, **kwargs):
+    cards.bump('group', instance.pk)
+
+
+@receiver(post_save, sender=User)
+def author_card_changed(sender, instance, created=False,
+                        update_fields=None, **kwargs):
+    shown = {'username', 'first_name', 'last_name'}
+    # У нового пользователя ещё нет постов ни на одной странице
+    if created or (
+        update_fields is not None and not shown & set(update_fields)
+    ):
+        return
+    cards.bump('user', instance.pk)
+
+
+@receiver(post_init, sender=Post)
+def remember_image(sender, instance, **kwargs):
+    # Имя файла, уже сохранённое в базе; загрузка в конструкторе не в счёт
+    image = instance.__dict__.get('image')
+    instance._loaded_image = image if isinstance(image, str) else None
+
+
+@receiver(post_save, sender=Post)
+def image_changed(sender, instance, created, **kwargs):
+    old = None if created else instance._loaded_image
+    new = instance.image.name or None
+    if new != old:
+        if new:
+            blobs.acquire(new)
+            thumbnails.schedule(instance)
+        if old:
+            blobs.release(old)
+    instance._loaded_image = new
+
+
+@receiver(post_delete, sender=Post)
+def image_released(sender, instance, **kwargs):
+    if instance.image:
+        blobs.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, **kwargs):
+    search.backend().index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    search.backend().remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_indexed(sender, instance, **kwargs):
+    search.backend().index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_unindexed(sender, instance, **kwargs):
+    search.backend().remove_comment(instance.pk)
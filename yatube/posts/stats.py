@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, User, UserStats
+
+BATCH_SIZE = 1000
+
+
+def count_for(user_id):
+    """Real counters of one user straight from the source tables."""
+    return {
+        'posts': Post.objects.filter(author_id=user_id).count(),
+        'comments': Comment.objects.filter(author_id=user_id).count(),
+        'followers': Follow.objects.filter(author_id=user_id).count(),
+        'following': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def rebuild_for(user_id):
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id, defaults=count_for(user_id)
+    )
+    return stats
+
+
+def get_stats(user):
+    """Counters of a user, a missing record is rebuilt on first access."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        user.stats = rebuild_for(user.pk)
+        return user.stats
+
+
+def bump(user_id, field, delta):
+    """Shift one counter by delta inside the caller's transaction."""
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats.filter(**{f'{field}__gte': -delta}).update(
+            **{field: F(field) + delta}
+        )
+        return
+    if not stats.update(**{field: F(field) + delta}):
+        # Записи ещё нет: считаем честно, новая строка уже в таблице
+        rebuild_for(user_id)
+
+
+def _group_counts(queryset, key):
+    return dict(
+        queryset.values_list(key).annotate(total=Count('pk')).order_by()
+    )
+
+
+def rebuild_all():
+    """Recount every user's counters from scratch, returns rows written."""
+    posts = _group_counts(Post.objects.all(), 'author_id')
+    comments = _group_counts(Comment.objects.all(), 'author_id')
+    followers = _group_counts(Follow.objects.all(), 'author_id')
+    following = _group_counts(Follow.objects.all(), 'user_id')
+    written = 0
+    with transaction.atomic():
+        UserStats.objects.all().delete()
+        batch = []
+        user_ids = User.objects.values_list('pk', flat=True).iterator()
+        for user_id in user_ids:
+            batch.append(UserStats(
+                user_id=user_id,
+                posts=posts.get(user_id, 0),
+                comments=comments.get(user_id, 0),
+                followers=followers.get(user_id, 0),
+                following=following.get(user_id, 0),
+            ))
+            if len(batch) >= BATCH_SIZE:
+                UserStats.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        UserStats.objects.bulk_create(batch)
+        written += len(batch)
+    return written
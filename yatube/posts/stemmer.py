@@ -0,0 +1,119 @@
+"""Snowball stemmer for Russian.
+
+SQLite FTS5 ships only the english porter tokenizer, so words are
+stemmed here both when a text is indexed and when a query is parsed.
+The algorithm follows snowballstem.org/algorithms/russian/stemmer.html.
+"""
+import functools
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    (('в', 'вши', 'вшись'), True),
+    (('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'), False),
+)
+ADJECTIVE = ((
+    ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+     'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+     'ая', 'яя', 'ою', 'ею'),
+    False,
+),)
+PARTICIPLE = (
+    (('ем', 'нн', 'вш', 'ющ', 'щ'), True),
+    (('ивш', 'ывш', 'ующ'), False),
+)
+REFLEXIVE = ((('ся', 'сь'), False),)
+VERB = (
+    (('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+      'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'), True),
+    (('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+      'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует',
+      'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'), False),
+)
+NOUN = ((
+    ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+     'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+     'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+     'ья', 'я'),
+    False,
+),)
+SUPERLATIVE = ((('ейш', 'ейше'), False),)
+DERIVATIONAL = ((('ост', 'ость'), False),)
+
+WORD = re.compile(r'\w+')
+CYRILLIC = re.compile(r'[а-я]')
+
+
+def _region(word, start):
+    """Position right after the first non-vowel following a vowel."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _ending(word, start, groups):
+    """Length of the longest ending of the groups lying after start.
+
+    Endings of a group marked True count only after 'а' or 'я', which
+    stays in the word.
+    """
+    best, after_a = '', False
+    for endings, needs_a in groups:
+        for ending in endings:
+            if (len(ending) > len(best) and word.endswith(ending)
+                    and len(word) - len(ending) >= start):
+                best, after_a = ending, needs_a
+    if after_a:
+        before = len(word) - len(best) - 1
+        if before < start or word[before] not in 'ая':
+            return 0
+    return len(best)
+
+
+def _cut(word, length):
+    return word[:len(word) - length]
+
+
+@functools.lru_cache(maxsize=100_000)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC.search(word):
+        return word
+    rv = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word)
+    )
+    r2 = _region(word, _region(word, 0))
+
+    length = _ending(word, rv, PERFECTIVE_GERUND)
+    if length:
+        word = _cut(word, length)
+    else:
+        word = _cut(word, _ending(word, rv, REFLEXIVE))
+        length = _ending(word, rv, ADJECTIVE)
+        if length:
+            word = _cut(word, length)
+            word = _cut(word, _ending(word, rv, PARTICIPLE))
+        else:
+            length = _ending(word, rv, VERB) or _ending(word, rv, NOUN)
+            word = _cut(word, length)
+
+    if word.endswith('и') and len(word) > rv:
+        word = word[:-1]
+
+    word = _cut(word, _ending(word, r2, DERIVATIONAL))
+
+    length = _ending(word, rv, SUPERLATIVE)
+    if length:
+        word = _cut(word, length)
+    if word.endswith('нн') and len(word) - 1 > rv:
+        word = word[:-1]
+    elif not length and word.endswith('ь') and len(word) > rv:
+        word = word[:-1]
+    return word
+
+
+def stem_text(text):
+    """Space separated stems of every word of the text."""
+    return ' '.join(stem(word) for word in WORD.findall(text))
@@ -0,0 +1,55 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Store every upload under the sha256 of its content.
+
+    Identical files end up under the same name, so their sorl thumbnails
+    are shared too. The directory of the name
+    given by upload_to and the file extension are kept.
+    """
+
+    chunk_size = 64 * 1024
+
+    def digest(self, content):
+        sha = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(self.chunk_size):
+            sha.update(chunk)
+        content.seek(0)
+        return sha.hexdigest()
+
+    def get_available_name(self, name, max_length=None):
+        # Имя всё равно заменит хэш содержимого в _save
+        return name
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = self.digest(content)
+        name = os.path.join(directory, digest[:2], digest + extension)
+        # Пишем всегда, даже если файл есть: его мог удалить purge() после
+        # удаления последнего поста с этой картинкой. Посты с картинками
+        # сохраняются в atomic под блокировкой записи, и purge() ждёт её,
+        # см. blobs.purge. Замена атомарна, читатели видят файл целиком
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks(self.chunk_size):
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return name
@@ -0,0 +1,18 @@
+from django import template
+
+from posts.holes import marker, render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, *args):
+    """Fragment of the page that depends on the visitor.
+
+    While the page cache renders a page it only leaves a marker, which is
+    filled for every visitor when the cached page is served.
+    """
+    request = context.get('request')
+    if getattr(request, 'punch_holes', False):
+        return marker(name, args)
+    return render_hole(request, name, args)
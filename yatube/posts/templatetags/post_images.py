@@ -0,0 +1,21 @@
+import logging
+
+from django import template
+
+from posts.images import picture as build_picture
+
+register = template.Library()
+logger = logging.getLogger(__name__)
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def picture(image, variant, css_class=''):
+    if not image:
+        return {}
+    try:
+        data = build_picture(image, variant)
+    except Exception:
+        # Как и {% thumbnail %}, не роняем страницу из-за битой картинки
+        logger.exception('Не удалось построить миниатюры %s', image)
+        return {}
+    return {'picture': data, 'css_class': css_class}
@@ -0,0 +1,166 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.settings import COMMENTS_PER_PAGE, POSTS_PER_PAGE
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Первый пост'
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_endpoints_return_json(self):
+        """API отдаёт те же посты, что и страницы."""
+        feeds = (
+            reverse('api:index'),
+            reverse('api:group_list', args=[self.group.slug]),
+            reverse('api:profile', args=[self.author.username]),
+            reverse('api:follow_index'),
+        )
+        for url in feeds:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(data['count'], 1)
+                self.assertEqual(data['results'][0]['text'], 'Первый пост')
+                self.assertEqual(data['results'][0]['author_name'],
+                                 'Лев Толстой')
+                self.assertEqual(data['results'][0]['group'], 'group')
+        data = self.client.get(
+            reverse('api:post_detail', args=[self.post.pk])
+        ).json()
+        self.assertEqual(data['id'], self.post.pk)
+        data = self.client.get(data['comments']).json()
+        self.assertEqual(data['results'][0]['author'], 'reader')
+
+    def test_pages_link_to_each_other(self):
+        """Ссылки next и previous ведут по страницам и курсорам."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}')
+            for i in range(POSTS_PER_PAGE)
+        )
+        data = self.client.get(reverse('api:index')).json()
+        self.assertIsNone(data['previous'])
+        data = self.client.get(data['next']).json()
+        self.assertEqual(len(data['results']), 1)
+        data = self.client.get(reverse('api:index') + '?cursor=').json()
+        self.assertNotIn('count', data)
+        self.assertIn('?cursor=', data['next'])
+
+    def test_comments_are_paginated(self):
+        """Комментарии в API отдаются порциями по курсору."""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.author, text=f'Ещё {i}')
+            for i in range(COMMENTS_PER_PAGE)
+        )
+        url = reverse('api:comments', args=[self.post.pk])
+        data = self.client.get(url).json()
+        self.assertEqual(len(data['results']), COMMENTS_PER_PAGE)
+        self.assertIsNone(data['previous'])
+        data = self.client.get(data['next']).json()
+        self.assertEqual(len(data['results']), 1)
+        self.assertIsNone(data['next'])
+
+    def test_not_modified_without_loading_rows(self):
+        """Свежая копия у клиента: 304 без выборки и сериализации постов."""
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_list', args=[self.group.slug]),
+            reverse('api:profile', args=[self.author.username]),
+            reverse('api:follow_index'),
+            reverse('api:post_detail', args=[self.post.pk]),
+            reverse('api:comments', args=[self.post.pk]),
+        )
+        for url in urls:
+            # Ленте подписок нужны ещё сессия, пользователь и проверка
+            # популярных авторов
+            budget = 4 if 'follow' in url else 1
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn('Last-Modified', response)
+                with self.assertNumQueries(budget):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response.content, b'')
+
+    def test_changes_make_etag_stale(self):
+        """Новые посты, правки, комментарии и удаления меняют ETag."""
+        index = reverse('api:index')
+        detail = reverse('api:post_detail', args=[self.post.pk])
+        changes = (
+            (index, lambda: Post.objects.create(
+                author=self.author, text='Новый пост'
+            )),
+            (index, lambda: Post.objects.filter(
+                text='Новый пост'
+            ).delete()),
+            (index, lambda: Post.objects.get(pk=self.post.pk).save()),
+            (index, lambda: User.objects.get(pk=self.author.pk).save()),
+            (detail, lambda: Comment.objects.create(
+                post=self.post, author=self.author, text='Ещё'
+            )),
+        )
+        for url, change in changes:
+            etag = self.client.get(url)['ETag']
+            change()
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_if_modified_since(self):
+        """Last-Modified работает и без ETag."""
+        url = reverse('api:index')
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_follow_feed_is_personal(self):
+        """Лента подписок требует входа и различается у пользователей."""
+        url = reverse('api:follow_index')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'], [])
+        self.client.logout()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_missing_objects(self):
+        """Несуществующие объекты и запись дают понятные ответы."""
+        for url in (
+            reverse('api:group_list', args=['missing']),
+            reverse('api:profile', args=['missing']),
+            reverse('api:post_detail', args=[0]),
+            reverse('api:comments', args=[0]),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code,
+                                 HTTPStatus.NOT_FOUND)
+        response = self.client.post(reverse('api:index'))
+        self.assertEqual(response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
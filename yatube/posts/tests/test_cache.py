@@ -0,0 +1,231 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, override_settings, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from . import test_views
+
+User = get_user_model()
+SHARED_CACHE_DIR = tempfile.mkdtemp()
+# Тестовый memcached: cache.clear() выполняет flush_all на всём сервере
+MEMCACHED_LOCATION = os.environ.get(
+    'YATUBE_TEST_MEMCACHED', '127.0.0.1:11211'
+)
+
+
+def shared_caches(backend, location):
+    return {
+        'default': {
+            'BACKEND': settings.CACHE_BACKENDS[backend],
+            'LOCATION': location,
+            'KEY_PREFIX': 'yatube-test',
+        }
+    }
+
+
+def memcached_available():
+    try:
+        import memcache
+    except ImportError:
+        return False
+    client = memcache.Client([MEMCACHED_LOCATION])
+    try:
+        return bool(client.get_stats())
+    finally:
+        client.disconnect_all()
+
+
+@override_settings(CACHES=shared_caches('file', SHARED_CACHE_DIR))
+class SharedCacheTests(TestCase):
+    """Кэш представлений на общем для нескольких процессов бэкенде."""
+
+    backend = 'file'
+    location = SHARED_CACHE_DIR
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(SHARED_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    test_cache = test_views.PostViewTests.test_cache
+
+    def run_in_other_process(self, code):
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='yatube.settings',
+            YATUBE_CACHE_BACKEND=self.backend,
+            YATUBE_CACHE_LOCATION=self.location,
+            YATUBE_CACHE_KEY_PREFIX='yatube-test',
+        )
+        subprocess.run(
+            [sys.executable, '-c', 'import django; django.setup(); ' + code],
+            cwd=settings.BASE_DIR, env=env, check=True,
+        )
+
+    def test_invalidation_crosses_processes(self):
+        """Сброс карточки в другом процессе виден этому процессу."""
+        post = Post.objects.create(text='Старый текст', author=self.user)
+        self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(id=post.id).update(text='Новый текст')
+        self.run_in_other_process(
+            f'from posts import cards; cards.bump("post", {post.pk})'
+        )
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новый текст')
+
+    def test_cache_written_by_other_process_is_read(self):
+        """Значение, записанное другим процессом, читается из кэша."""
+        self.run_in_other_process(
+            'from django.core.cache import cache; '
+            'cache.set("shared-probe", 42, None)'
+        )
+        self.assertEqual(cache.get('shared-probe'), 42)
+
+
+@unittest.skipUnless(
+    memcached_available(), f'нет python-memcached или {MEMCACHED_LOCATION}'
+)
+@override_settings(CACHES=shared_caches('memcached', MEMCACHED_LOCATION))
+class MemcachedSharedCacheTests(SharedCacheTests):
+    """Те же проверки на memcached, адрес - YATUBE_TEST_MEMCACHED."""
+
+    backend = 'memcached'
+    location = MEMCACHED_LOCATION
+
+
+class PageCacheTests(TestCase):
+    """Общий кеш страниц с дырками для данных посетителя."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_guest_page_is_served_from_cache(self):
+        """Повторная страница для гостя не ходит в базу."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+            reverse('posts:profile', kwargs={'username': 'writer'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(first.content, second.content)
+                self.assertNotContains(second, '<!--hole')
+
+    def test_users_get_own_fragments(self):
+        """Из одной копии каждый видит свою шапку и кнопки."""
+        profile = reverse('posts:profile', kwargs={'username': 'writer'})
+        self.client.get(profile)
+        response = self.reader_client.get(profile)
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertContains(response, 'Отписаться')
+        response = self.author_client.get(profile)
+        self.assertContains(response, 'Пользователь: writer')
+        self.assertContains(response, 'Подписаться')
+        response = self.client.get(profile)
+        self.assertContains(response, 'Войти')
+
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        edit = reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        self.client.get(detail)
+        response = self.author_client.get(detail)
+        self.assertContains(response, edit)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        response = self.reader_client.get(detail)
+        self.assertNotContains(response, edit)
+        self.assertContains(response, 'Добавить комментарий')
+        response = self.client.get(detail)
+        self.assertNotContains(response, 'Добавить комментарий')
+
+    def test_cached_comment_form_passes_csrf(self):
+        """Форма комментария из кеша проходит проверку CSRF."""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.reader)
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.client.get(detail)
+        response = client.get(detail)
+        token = response.content.decode().split(
+            'name="csrfmiddlewaretoken" value="'
+        )[1].split('"')[0]
+        client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Из кеша', 'csrfmiddlewaretoken': token},
+        )
+        self.assertTrue(Comment.objects.filter(text='Из кеша').exists())
+
+    def test_changes_invalidate_pages(self):
+        """Посты, комментарии и группы сбрасывают кеш страниц."""
+        index = reverse('posts:index')
+        group = reverse('posts:group_list', kwargs={'slug': 'group'})
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        for url in (index, group, detail):
+            self.client.get(url)
+        Post.objects.create(text='Свежий пост', author=self.author)
+        self.assertContains(self.client.get(index), 'Свежий пост')
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Свежий комментарий'
+        )
+        self.assertContains(self.client.get(detail), 'Свежий комментарий')
+        group_obj = Group.objects.get(pk=self.group.pk)
+        group_obj.title = 'Новое название'
+        group_obj.save()
+        self.assertContains(self.client.get(group), 'Новое название')
+
+    def test_comments_and_new_users_keep_other_pages(self):
+        """Комментарий сбрасывает только страницу своего поста."""
+        other = Post.objects.create(text='Другой пост', author=self.author)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+            reverse('posts:profile', kwargs={'username': 'writer'}),
+            reverse('posts:post_detail', kwargs={'post_id': other.pk}),
+        )
+        for url in urls:
+            self.client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        User.objects.create_user(username='newcomer')
+        for url in urls:
+            with self.subTest(url=url):
+                with self.assertNumQueries(0):
+                    self.client.get(url)
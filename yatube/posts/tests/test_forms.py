@@ -1,5 +1,8 @@
+import hashlib
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -8,13 +11,15 @@ from django.urls import reverse
 from posts.models import Comment, Group, Post, User
 from posts.forms import PostForm
 from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from posts.settings import IMAGE_MASTER_MAX_SIDE
 
 User = get_user_model()
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -82,10 +87,10 @@ class PostFormTests(TestCase):
         self.assertEqual(
             response.context.get('post').group.title, 'Тестовая группа'
         )
-        self.assertTrue(
-            Post.objects.filter(
-                image='posts/small.gif'
-            ).exists())
+        post = Post.objects.exclude(image='').get(text=form_data['text'])
+        with post.image.open() as image:
+            digest = hashlib.sha256(image.read()).hexdigest()
+        self.assertEqual(post.image.name, f'posts/{digest[:2]}/{digest}.gif')
 
     def test_edit_post(self):
         """Тест на редактирование поста"""
@@ -136,3 +141,60 @@ class PostFormTests(TestCase):
         self.assertEqual(Comment.objects.count(), comment_count + 1)
         self.assertEqual(comment.text, form_data['text'])
         self.assertEqual(comment.author, PostFormTests.user)
+
+
+class PostFormImageTests(TestCase):
+    @staticmethod
+    def jpeg_upload(size):
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        content = BytesIO()
+        Image.new('RGB', size, 'red').save(content, 'JPEG', exif=exif)
+        return SimpleUploadedFile(
+            'photo.jpg', content.getvalue(), content_type='image/jpeg'
+        )
+
+    def test_large_image_is_downsized_and_stripped(self):
+        """Большая картинка уменьшается и теряет метаданные EXIF."""
+        form = PostForm(
+            data={'text': 'Текст'},
+            files={'image': self.jpeg_upload((3000, 1000))},
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        master = Image.open(form.cleaned_data['image'])
+        self.assertEqual(max(master.size), IMAGE_MASTER_MAX_SIDE)
+        self.assertEqual(master.format, 'JPEG')
+        self.assertFalse(master.getexif())
+
+    def test_image_over_budget_is_rejected(self):
+        """Слишком тяжёлая или крупная картинка не проходит валидацию."""
+        for setting in ('IMAGE_MAX_UPLOAD_BYTES', 'IMAGE_MAX_PIXELS'):
+            with self.subTest(setting=setting):
+                with mock.patch(f'posts.images.{setting}', 100):
+                    form = PostForm(
+                        data={'text': 'Текст'},
+                        files={'image': self.jpeg_upload((20, 20))},
+                    )
+                    self.assertFalse(form.is_valid())
+                    self.assertIn('image', form.errors)
+
+    def test_unsupported_format_is_rejected(self):
+        """Картинка, которую Pillow не умеет записать, не проходит."""
+        xpm = (
+            b'/* XPM */\n'
+            b'static char *image[] = {\n'
+            b'"2 1 1 1",\n'
+            b'"a c #FF0000",\n'
+            b'"aa"\n'
+            b'};\n'
+        )
+        form = PostForm(
+            data={'text': 'Текст'},
+            files={'image': SimpleUploadedFile(
+                'icon.xpm', xpm, content_type='image/x-xpixmap'
+            )},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'unsupported_format'
+        )
@@ -0,0 +1,105 @@
+import json
+import os
+import random
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import LiveServerTestCase, TestCase
+
+from posts.loadgen import generate
+from posts.models import Comment, FeedEntry, Follow, Post, User, UserStats
+
+
+class LoadDataTests(TestCase):
+    def test_generated_data_is_skewed_and_consistent(self):
+        """Немногие авторы пишут большую часть постов, счётчики верны."""
+        counts = generate(
+            random.Random(0), users=50, groups=3, posts=1000, comments=500,
+            follows=300,
+        )
+        self.assertEqual(counts['post'], Post.objects.count())
+        self.assertEqual(counts['comment'], Comment.objects.count())
+        self.assertEqual(counts['follow'], Follow.objects.count())
+        posts = sorted(
+            UserStats.objects.values_list('posts', flat=True), reverse=True
+        )
+        self.assertEqual(sum(posts), 1000)
+        self.assertGreater(sum(posts[:5]), 400)
+        follow = Follow.objects.first()
+        self.assertEqual(
+            FeedEntry.objects.filter(user=follow.user_id).count(),
+            Post.objects.filter(
+                author__following__user=follow.user_id
+            ).count(),
+        )
+        for comment in Comment.objects.select_related('post')[:50]:
+            self.assertGreaterEqual(comment.created, comment.post.pub_date)
+
+    def test_generate_again_adds_rows(self):
+        """Повторный запуск добавляет данные, а не падает на именах."""
+        for _ in range(2):
+            call_command(
+                'generate_load_data', users=5, groups=1, posts=10,
+                comments=10, follows=10, stdout=StringIO(), stderr=StringIO(),
+            )
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Post.objects.count(), 20)
+
+
+class BenchViewsTests(TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.ndjson')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def bench(self, **options):
+        out = StringIO()
+        call_command(
+            'bench_views', sizes='40', repeat=1, stdout=out,
+            stderr=StringIO(), **options
+        )
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_every_route_is_measured(self):
+        """Каждый маршрут замерен для гостя и пользователя без ошибок."""
+        rows = [row for row in self.bench() if 'route' in row]
+        routes = {(row['route'], row['client']) for row in rows}
+        for route in ('posts:index', 'posts:post_comments', 'api:comments',
+                      'users:signup', 'about:tech'):
+            for client in ('guest', 'user'):
+                self.assertIn((route, client), routes)
+        for row in rows:
+            with self.subTest(route=row['route'], client=row['client']):
+                self.assertLess(row['status'], 500)
+        self.assertFalse(Post.objects.exists())
+
+    def test_baseline_catches_extra_queries(self):
+        """Рост числа запросов против прошлого замера - ошибка."""
+        rows = self.bench()
+        with open(self.path, 'w', encoding='utf-8') as baseline:
+            for row in rows:
+                if row.get('route') == 'posts:index':
+                    row['queries'] -= 1
+                baseline.write(json.dumps(row) + '\n')
+        with self.assertRaisesMessage(CommandError, 'Регрессий'):
+            self.bench(baseline=self.path, tolerance=100)
+
+
+class BenchHttpTests(LiveServerTestCase):
+    def test_running_server_is_measured(self):
+        """Запущенный сервер нагружается без ошибок на каждом уровне."""
+        generate(
+            random.Random(0), users=10, groups=2, posts=40, comments=40,
+            follows=30,
+        )
+        out = StringIO()
+        call_command(
+            'bench_http', url=self.live_server_url, concurrency='1,2',
+            seconds=0.2, stdout=out,
+        )
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['concurrency'] for row in rows], [1, 2])
+        for row in rows:
+            self.assertEqual(row['errors'], 0)
+            self.assertGreater(row['requests_per_second'], 0)
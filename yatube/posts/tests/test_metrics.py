@@ -0,0 +1,67 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(REQUEST_METRICS=True, REQUEST_METRICS_SLOW_MS=None)
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.staff = User.objects.create_user(username='admin', is_staff=True)
+
+    def setUp(self):
+        metrics.flush(force=True)
+        cache.clear()
+
+    def test_views_get_histograms(self):
+        """Каждое представление копит запросы, время и размер ответов."""
+        for _ in range(3):
+            cache.clear()
+            self.client.get(reverse('posts:index'))
+        self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        data = metrics.snapshot()
+        index = data['posts:index']
+        self.assertEqual(index['requests'], 3)
+        self.assertEqual(sum(index['queries']['buckets'].values()), 3)
+        self.assertGreater(index['queries']['sum'], 0)
+        self.assertGreater(index['template_ms']['sum'], 0)
+        self.assertGreater(index['bytes']['sum'], 1000)
+        self.assertEqual(data['posts:post_detail']['requests'], 1)
+
+    @override_settings(REQUEST_METRICS=False)
+    def test_disabled_by_setting(self):
+        """Без настройки ничего не замеряется."""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(metrics.snapshot(), {})
+
+    def test_endpoint_is_for_staff(self):
+        """Гистограммы видят только сотрудники."""
+        url = reverse('request_metrics')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        staff = Client()
+        staff.force_login(self.staff)
+        staff.get(reverse('posts:index'))
+        response = staff.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('posts:index', response.json())
+
+    @override_settings(REQUEST_METRICS_SLOW_MS=0)
+    def test_slow_requests_are_logged_with_sql(self):
+        """Медленный запрос попадает в лог вместе со своим SQL."""
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
@@ -1,7 +1,11 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -41,3 +45,50 @@ class GroupModelTest(TestCase):
         """Проверяем, что у моделей корректно работает __str__."""
         group = GroupModelTest.group
         self.assertEqual(str(group), group.title)
+
+
+class UserStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_creation_and_deletion(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author).posts, 1)
+        self.assertEqual(self.stats(self.author).followers, 1)
+        self.assertEqual(self.stats(self.reader).comments, 1)
+        self.assertEqual(self.stats(self.reader).following, 1)
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts, 0)
+        self.assertEqual(self.stats(self.author).followers, 0)
+        self.assertEqual(self.stats(self.reader).comments, 0)
+        self.assertEqual(self.stats(self.reader).following, 0)
+
+    def test_rebuild_command_recounts_from_scratch(self):
+        """rebuild_user_stats восстанавливает испорченные счётчики."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'Пост {i}') for i in range(3)
+        ])
+        UserStats.objects.filter(user=self.author).delete()
+        call_command('rebuild_user_stats', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).posts, 3)
+        self.assertEqual(self.stats(self.reader).posts, 0)
+
+
+class FollowModelTest(TestCase):
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора запрещена базой."""
+        user = User.objects.create_user(username='fan')
+        author = User.objects.create_user(username='star')
+        Follow.objects.create(user=user, author=author)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=user, author=author)
@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.replicas import PIN_COOKIE, ReplicaRouter, copy_database, reads
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(READ_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_outside_views_use_default(self):
+        """Вне replica_reads чтения идут в основную базу."""
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_reads_inside_go_to_replicas(self):
+        """Внутри replica_reads чтения идут в одну из реплик."""
+        with reads():
+            self.assertIn(
+                self.router.db_for_read(Post), ['replica1', 'replica2']
+            )
+            self.assertIsNone(self.router.db_for_read(Session))
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_writes_and_migrations_use_default(self):
+        """Запись и миграции - только в основную базу."""
+        with reads():
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+
+@override_settings(READ_REPLICAS=['default'])
+class ReadYourWritesTests(TestCase):
+    """В тестах реплика - сама основная база: видно только, куда
+    маршрутизатор отправил чтение."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        patcher = mock.patch(
+            'core.replicas.random.choice', return_value='default'
+        )
+        self.choice = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertReadsReplica(self, expected):
+        self.choice.reset_mock()
+        cache.clear()
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(self.choice.called, expected)
+
+    def test_feed_reads_replicas(self):
+        """Главная страница читается с реплики."""
+        self.assertReadsReplica(True)
+
+    def test_comment_pins_primary(self):
+        """После комментария пользователь читает основную базу."""
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'},
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertReadsReplica(False)
+
+    def test_follow_pins_primary(self):
+        """После подписки пользователь читает основную базу."""
+        response = self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author.username}
+        ))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertReadsReplica(False)
+
+    def test_user_reads_primary(self):
+        """Пользователь сессии читается из основной базы, не с реплики."""
+        routed = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            database = db_for_read(router, model, **hints)
+            if database is not None:
+                routed.append(model)
+            return database
+        with mock.patch.object(ReplicaRouter, 'db_for_read', record):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.context['user'], self.user)
+        self.assertIn(Post, routed)
+        self.assertNotIn(User, routed)
+
+    def test_signup_and_login_pin_primary(self):
+        """После регистрации и входа пользователь читает основную базу."""
+        guest = Client()
+        response = guest.post(reverse('users:signup'), {
+            'username': 'newcomer',
+            'password1': 'Trudno-ugadat-42',
+            'password2': 'Trudno-ugadat-42',
+        })
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response = Client().post(reverse('users:login'), {
+            'username': 'newcomer', 'password': 'Trudno-ugadat-42',
+        })
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_pin_expires(self):
+        """Истёкшая метка снова пускает на реплики."""
+        self.client.cookies[PIN_COOKIE] = str(time.time() - 1)
+        self.assertReadsReplica(True)
+
+    def test_replica_page_cached_briefly(self):
+        """Страница с реплики кешируется только на REPLICA_PIN_SECONDS."""
+        with mock.patch('posts.pagecache.cache.set') as cache_set:
+            self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            cache_set.call_args[0][2], settings.REPLICA_PIN_SECONDS
+        )
+
+
+class ReplicateCommandTests(SimpleTestCase):
+    def test_copy_database(self):
+        """Копия базы SQLite содержит данные основной."""
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'primary.sqlite3')
+            target = os.path.join(directory, 'replica.sqlite3')
+            with sqlite3.connect(source) as primary:
+                primary.execute('CREATE TABLE t (value TEXT)')
+                primary.execute("INSERT INTO t VALUES ('пост')")
+            primary.close()
+            copy_database(source, target)
+            replica = sqlite3.connect(target)
+            try:
+                self.assertEqual(
+                    replica.execute('SELECT value FROM t').fetchall(),
+                    [('пост',)],
+                )
+            finally:
+                replica.close()
+
+    @override_settings(READ_REPLICAS=[])
+    def test_no_replicas(self):
+        """Без реплик копировать некуда."""
+        with self.assertRaises(CommandError):
+            call_command('replicate')
@@ -0,0 +1,126 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+from posts.search import LikeBackend, backend
+from posts.settings import POSTS_PER_PAGE
+from posts.stemmer import stem
+
+User = get_user_model()
+
+
+class StemmerTests(TestCase):
+    def test_word_forms_share_stem(self):
+        """Формы одного слова сводятся к одной основе."""
+        forms = {
+            'программирование': 'программирован',
+            'программированием': 'программирован',
+            'книгами': 'книг',
+            'книга': 'книг',
+            'красивейший': 'красив',
+            'ёлки': 'елк',
+            'Django': 'django',
+        }
+        for word, expected in forms.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.other = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.in_text = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Заметки о программировании на питоне',
+        )
+        cls.in_comment = Post.objects.create(
+            author=cls.other, text='Просто пост без ключевых слов'
+        )
+        Comment.objects.create(
+            post=cls.in_comment, author=cls.author,
+            text='Люблю программирование',
+        )
+        Post.objects.create(author=cls.other, text='Про кошку и собаку')
+
+    def test_finds_other_word_forms_ranked(self):
+        """Ищем по основе, совпадение в посте выше совпадения в комментарии."""
+        self.assertEqual(
+            backend().search('программированием'),
+            [self.in_text.pk, self.in_comment.pk],
+        )
+
+    def test_prefix_and_filters(self):
+        """Префиксный поиск и фильтры по группе и автору."""
+        self.assertEqual(backend().search('прогр*', group_id=self.group.pk),
+                         [self.in_text.pk])
+        self.assertEqual(
+            backend().search('программирование', author_id=self.other.pk),
+            [self.in_comment.pk],
+        )
+        self.assertEqual(backend().search('прогр'), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Сигналы обновляют индекс при правке и удалении."""
+        post = Post.objects.get(pk=self.in_text.pk)
+        post.text = 'Теперь про кошку'
+        post.save()
+        self.assertEqual(backend().search('питон'), [])
+        self.assertEqual(len(backend().search('кошка')), 2)
+        Post.objects.filter(pk=self.in_comment.pk).delete()
+        self.assertEqual(backend().search('программирование'), [])
+
+    def test_rebuild_command_matches_signals(self):
+        """Перестроенный индекс совпадает с обновляемым сигналами."""
+        before = backend().search('программирование')
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(backend().search('программирование'), before)
+
+    def test_like_backend_finds_same_posts(self):
+        """Запасной бэкенд находит те же посты."""
+        self.assertEqual(
+            set(LikeBackend().search('программированием')),
+            {self.in_text.pk, self.in_comment.pk},
+        )
+
+    def test_search_page(self):
+        """Страница поиска показывает найденное и фильтрует по группе."""
+        url = reverse('posts:search')
+        response = self.client.get(url, {'q': 'программирование'})
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [self.in_text.pk, self.in_comment.pk],
+        )
+        response = self.client.get(
+            url, {'q': 'программирование', 'group': self.group.slug}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [self.in_text.pk],
+        )
+        response = self.client.get(
+            url, {'q': 'программирование', 'author': 'nobody'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_search_pages_keep_query(self):
+        """Ссылки паджинатора сохраняют запрос."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост про море {i}')
+            for i in range(POSTS_PER_PAGE + 1)
+        )
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        response = self.client.get(reverse('posts:search'), {'q': 'морем'})
+        self.assertEqual(len(response.context['page_obj']), POSTS_PER_PAGE)
+        self.assertContains(response, '?q=%D0%BC%D0%BE%D1%80%D0%B5%D0%BC'
+                                      '&amp;page=2')
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'морем', 'page': 2}
+        )
+        self.assertEqual(len(response.context['page_obj']), 1)
@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import tempfile
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import SimpleTestCase, override_settings
+
+
+class SQLiteTuningTests(SimpleTestCase):
+    """Файловая база: тестовая в памяти не умеет WAL."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'tuning.sqlite3')
+        connections.databases['tuning'] = {
+            **connections[DEFAULT_DB_ALIAS].settings_dict, 'NAME': self.path,
+        }
+        self.addCleanup(connections.databases.pop, 'tuning')
+        self.connection = connections['tuning']
+        self.addCleanup(delattr, connections._connections, 'tuning')
+        self.addCleanup(self.connection.close)
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """Новое соединение включает WAL и остальные прагмы."""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        # NORMAL
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertGreater(self.pragma('busy_timeout'), 0)
+        self.assertGreater(self.pragma('mmap_size'), 0)
+
+    def test_transactions_take_write_lock(self):
+        """atomic сразу берёт блокировку записи."""
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with transaction.atomic(using='tuning'):
+            with self.assertRaisesMessage(
+                sqlite3.OperationalError, 'database is locked'
+            ):
+                other.execute('BEGIN IMMEDIATE')
+        other.execute('BEGIN IMMEDIATE')
+        other.rollback()
+
+    @override_settings(SQLITE_PRAGMAS={}, SQLITE_IMMEDIATE_TRANSACTIONS=False)
+    def test_defaults_when_turned_off(self):
+        """Без настроек соединение остаётся таким, каким его делает Django."""
+        self.assertEqual(self.pragma('journal_mode'), 'delete')
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with transaction.atomic(using='tuning'):
+            other.execute('BEGIN IMMEDIATE')
+            other.rollback()
@@ -0,0 +1,85 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings, TestCase
+
+from posts import blobs
+from posts.models import MediaBlob, Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@mock.patch('posts.thumbnails.schedule')
+@mock.patch('posts.blobs.transaction.on_commit', lambda func: func())
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name):
+        return Post.objects.create(
+            author=self.user,
+            text='Мем',
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif'),
+        )
+
+    def test_identical_uploads_share_one_file(self, schedule):
+        """Одинаковые картинки хранятся одним файлом со счётчиком."""
+        first = self.create_post('meme.gif')
+        second = self.create_post('copy-of-meme.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).refs, 2)
+
+    def test_file_is_deleted_with_last_post(self, schedule):
+        """Файл удаляется вместе с последним ссылающимся постом."""
+        first = self.create_post('meme.gif')
+        second = self.create_post('meme.gif')
+        name = first.image.name
+        storage = first.image.storage
+        first.delete()
+        self.assertTrue(storage.exists(name))
+        second.delete()
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_existing_file_is_written_again(self, schedule):
+        """Файл пишется заново, даже если он есть: его могут удалять."""
+        first = self.create_post('meme.gif')
+        name = first.image.name
+        storage = first.image.storage
+        first.delete()
+        # Файл удаляется сразу после того, как загрузка увидела его
+        with mock.patch.object(
+            type(storage), 'exists',
+            lambda self, name: storage.delete(name) or True,
+        ):
+            second = self.create_post('meme.gif')
+        self.assertEqual(second.image.name, name)
+        self.assertTrue(storage.exists(name))
+
+    def test_purge_keeps_file_of_saved_post(self, schedule):
+        """Файл, на который ссылается пост, не удаляется."""
+        post = self.create_post('meme.gif')
+        name = post.image.name
+        MediaBlob.objects.filter(name=name).delete()
+        blobs.purge(name)
+        self.assertTrue(post.image.storage.exists(name))
@@ -0,0 +1,99 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+from posts.images import thumbnail_specs
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Хранилище ключей sorl кэширует миниатюры прошлых тестов
+        cache.clear()
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def test_new_image_is_scheduled_once(self):
+        """Миниатюры заказываются только при смене картинки."""
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            post = self.create_post()
+            post.text = 'Правка текста'
+            post.save()
+            Post.objects.get(pk=post.pk).save()
+        schedule.assert_called_once_with(post)
+
+    def test_command_renders_all_geometries(self):
+        """Команда создаёт все миниатюры из шаблонов."""
+        with mock.patch('posts.thumbnails.schedule'):
+            self.create_post()
+        out = StringIO()
+        call_command('pregenerate_thumbnails', '--workers=1', stdout=out)
+        self.assertIn('Обработано картинок: 1', out.getvalue())
+        thumbs = [
+            name
+            for _, _, files in os.walk(os.path.join(TEMP_MEDIA_ROOT, 'cache'))
+            for name in files
+        ]
+        self.assertEqual(len(thumbs), len(list(thumbnail_specs())))
+
+    def test_pages_render_responsive_picture(self):
+        """Лента и пост отдают <picture> с WebP и запасным srcset."""
+        with mock.patch('posts.thumbnails.schedule'):
+            post = self.create_post()
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, '<picture>')
+                self.assertContains(response, 'type="image/webp"')
+                self.assertContains(response, '.webp ')
+                self.assertContains(response, '.jpg ')
+
+    def test_measure_image_bytes_reports_json(self):
+        """Замер объёма картинок печатает строку JSON на экран."""
+        with mock.patch('posts.thumbnails.schedule'):
+            self.create_post()
+        out = StringIO()
+        call_command('measure_image_bytes', '--screen=375x2', stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual(result['images'], 1)
+        self.assertIn('responsive_bytes', result['feed_page'])
@@ -0,0 +1,172 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import (Comment, FeedEntry, Follow, Group, MediaBlob, Post,
+                          UserStats)
+from posts.search import backend
+
+User = get_user_model()
+
+
+class TransferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Война и мир'
+        )
+        # Картинки без сигналов: файлов для миниатюр нет
+        Post.objects.bulk_create([
+            Post(author=cls.author, text=f'С картинкой {i}',
+                 image='posts/picture.jpg')
+            for i in range(2)
+        ])
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Прочитал'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.ndjson')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def export(self):
+        call_command(
+            'export_ndjson', self.path, batch_size=2,
+            stdout=StringIO(), stderr=StringIO(),
+        )
+
+    def load(self, **options):
+        call_command(
+            'import_ndjson', self.path, batch_size=2,
+            stdout=StringIO(), stderr=StringIO(), **options
+        )
+
+    def test_round_trip_into_empty_database(self):
+        """Дамп переносит данные целиком и восстанавливает производные."""
+        dates = dict(Post.objects.values_list('text', 'pub_date'))
+        self.export()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.load()
+        author = User.objects.get(username='writer')
+        self.assertEqual(author.get_full_name(), 'Лев Толстой')
+        self.assertFalse(author.has_usable_password())
+        self.assertEqual(
+            dict(Post.objects.values_list('text', 'pub_date')), dates
+        )
+        post = Post.objects.get(text='Война и мир')
+        self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(post.comments.get().author.username, 'reader')
+        reader = User.objects.get(username='reader')
+        self.assertTrue(
+            Follow.objects.filter(user=reader, author=author).exists()
+        )
+        self.assertEqual(UserStats.objects.get(user=author).posts, 3)
+        self.assertEqual(UserStats.objects.get(user=reader).following, 1)
+        self.assertEqual(FeedEntry.objects.filter(user=reader).count(), 3)
+        self.assertEqual(MediaBlob.objects.get().refs, 2)
+        self.assertEqual(backend().search('войной'), [post.pk])
+
+    def test_import_matches_users_and_groups(self):
+        """Пользователи и группы не дублируются, посты получают новые id."""
+        self.export()
+        self.load()
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        copy = Post.objects.filter(text='Война и мир').latest('pk')
+        self.assertNotEqual(copy.pk, self.post.pk)
+        self.assertEqual(copy.group_id, self.group.pk)
+        self.assertEqual(copy.comments.count(), 1)
+        self.assertEqual(self.post.comments.count(), 1)
+
+    def test_dump_is_ordered_ndjson(self):
+        """Каждая строка - JSON, виды записей идут по порядку."""
+        self.export()
+        with open(self.path, encoding='utf-8') as dump:
+            kinds = [json.loads(line)['model'] for line in dump]
+        self.assertEqual(kinds, [
+            'user', 'user', 'group', 'post', 'post', 'post', 'comment',
+            'follow',
+        ])
+
+    def test_bad_dump_names_the_line(self):
+        """Ошибка в дампе указывает на строку и не пишет её."""
+        lines = (
+            {'model': 'comment', 'post': 999, 'author': 'reader',
+             'text': 'Куда?', 'created': '2022-01-01T00:00:00+00:00'},
+        )
+        with open(self.path, 'w', encoding='utf-8') as dump:
+            dump.write('\n'.join(json.dumps(line) for line in lines))
+        with self.assertRaisesMessage(CommandError, 'Строка 1'):
+            self.load()
+        self.assertFalse(Comment.objects.filter(text='Куда?').exists())
+
+
+class ExportPostsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.other = User.objects.create_user(username='other')
+        for number in range(3):
+            Post.objects.create(author=cls.author, text=f'Пост {number}')
+        Post.objects.create(author=cls.other, text='Чужой пост')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def export(self, format):
+        response = self.client.get(
+            reverse('posts:export_posts', kwargs={'format': format})
+        )
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        """NDJSON - только свои посты, строками дампа."""
+        records = list(map(json.loads, self.export('ndjson').splitlines()))
+        self.assertEqual(
+            [record['text'] for record in records],
+            ['Пост 0', 'Пост 1', 'Пост 2'],
+        )
+        self.assertEqual({record['model'] for record in records}, {'post'})
+
+    def test_csv(self):
+        """CSV - заголовок и по строке на пост."""
+        rows = list(csv.DictReader(StringIO(self.export('csv'))))
+        self.assertEqual(
+            [row['text'] for row in rows], ['Пост 0', 'Пост 1', 'Пост 2']
+        )
+        self.assertEqual({row['author'] for row in rows}, {'writer'})
+
+    def test_unknown_format(self):
+        """Других форматов нет."""
+        response = self.client.get(
+            reverse('posts:export_posts', kwargs={'format': 'xml'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_guest_redirected(self):
+        """Гостя отправляют на вход."""
+        self.client.logout()
+        response = self.client.get(
+            reverse('posts:export_posts', kwargs={'format': 'csv'})
+        )
+        self.assertEqual(response.status_code, 302)
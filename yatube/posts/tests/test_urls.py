@@ -1,6 +1,7 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
@@ -26,7 +27,8 @@ class StaticURLTests(TestCase):
         cls.list_urls_all_client = [
             'posts/index.html',
             'posts/group_list.html',
-            'posts/profile.html'
+            'posts/profile.html',
+            'posts/search.html',
         ]
         cls.list_urls_authorized_client = [
             'posts/post_detail.html',
@@ -40,6 +42,7 @@ class StaticURLTests(TestCase):
             f'/posts/{cls.post.id}/': 'posts/post_detail.html',
             '/create/': 'posts/create_post.html',
             '/follow/': 'posts/follow.html',
+            '/search/': 'posts/search.html',
         }
         cls.url_names_social = [
             reverse(
@@ -54,6 +57,8 @@ class StaticURLTests(TestCase):
         ]
 
     def setUp(self):
+        # Страница из общего кеша приходит без контекста шаблона
+        cache.clear()
         self.guest_client = Client()
         self.user = User.objects.create_user(username='HasNoName')
         self.authorized_client = Client()
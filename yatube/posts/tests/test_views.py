@@ -1,11 +1,18 @@
+import datetime
+import shutil
 import tempfile
+from http import HTTPStatus
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import Client, override_settings, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Follow, Group, Post
+from posts.models import Comment, FeedEntry, Follow, Group, Post
 from posts.forms import PostForm
-from posts.settings import POSTS_PER_PAGE
+from posts.paginators import encode_cursor
+from posts.settings import COMMENTS_PER_PAGE, POSTS_PER_PAGE
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
@@ -15,7 +22,7 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostViewTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -58,7 +65,14 @@ class PostViewTests(TestCase):
                     'username': cls.user.username}),
         ]
 
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
     def setUp(self):
+        # Страница из общего кеша приходит без контекста шаблона
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(PostViewTests.user)
 
@@ -136,24 +150,36 @@ class PostViewTests(TestCase):
         self.assertIsInstance(form, PostForm)
 
     def test_cache(self):
-        """ Тестирование работы кэша"""
-        response_no_post = self.authorized_client.get(reverse('posts:index'))
-        post = Post.objects.create(text='test', author=self.user)
-        response_exist_post = self.authorized_client.get(
-            reverse('posts:index'))
+        """Карточка поста берётся из кэша и обновляется после правки."""
+        post = Post.objects.create(text='Старый текст', author=self.user)
+        self.authorized_client.get(reverse('posts:index'))
+        # update() не шлёт сигналов, поэтому карточка остаётся в кэше
+        Post.objects.filter(id=post.id).update(text='Новый текст')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Старый текст')
+        post.text = 'Новый текст'
+        post.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новый текст')
+        self.assertNotContains(response, 'Старый текст')
         Post.objects.filter(id=post.id).delete()
-        response_post_delete = self.authorized_client.get(
-            reverse('posts:index'))
-        self.assertEqual(
-            response_exist_post.content,
-            response_post_delete.content
-        )
-        cache.clear()
-        response_after_delete = self.authorized_client.get(
-            reverse('posts:index'))
-        self.assertTrue(
-            response_after_delete.context['page_obj'].count,
-            response_no_post.context['page_obj'].count)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Новый текст')
+
+    def test_card_cache_follows_group_and_author_edits(self):
+        """Правка группы или автора сразу видна во всех лентах."""
+        self.authorized_client.get(reverse('posts:index'))
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed-slug'
+        group.save()
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Лев'
+        author.save()
+        for url in self.posts_pages_reverse[::2]:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, '/group/renamed-slug/')
+                self.assertContains(response, 'Лев')
 
     def test_authorized_user_follow(self):
         """ Подписка авторизованным пользователем """
@@ -282,3 +308,386 @@ class PaginatorViewsTest(TestCase):
             with self.subTest(expected=expected):
                 response = self.client.get(expected)
                 self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_cursor_pages_walk_whole_feed(self):
+        """Курсорная пагинация проходит ленту вперёд и назад без пропусков."""
+        url = reverse('posts:index')
+        first = self.client.get(url + '?cursor=').context['page_obj']
+        self.assertEqual(len(first), POSTS_PER_PAGE)
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.next_cursor)
+        second = self.client.get(
+            f'{url}?cursor={first.next_cursor}'
+        ).context['page_obj']
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next())
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        self.assertEqual(list(first) + list(second), expected)
+        back = self.client.get(
+            f'{url}?cursor={second.previous_cursor}'
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Повреждённый курсор отдаёт первую страницу ленты."""
+        response = self.client.get(reverse('posts:index') + '?cursor=abc')
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), POSTS_PER_PAGE)
+        self.assertFalse(page_obj.has_previous())
+
+    def test_stale_cursor_returns_first_page(self):
+        """Курсор за концом ленты или с огромным id не ломает страницу."""
+        cursors = (
+            encode_cursor(Post(pk=1, pub_date=datetime.datetime(
+                2000, 1, 1, tzinfo=datetime.timezone.utc
+            ))),
+            encode_cursor(Post(pk=2 ** 64, pub_date=datetime.datetime.now(
+                datetime.timezone.utc
+            ))),
+        )
+        urls = (
+            reverse('posts:index'),
+            reverse('api:index'),
+            reverse('posts:post_comments', kwargs={
+                'post_id': Post.objects.first().pk
+            }),
+        )
+        for cursor in cursors:
+            for url in urls:
+                with self.subTest(url=url, cursor=cursor):
+                    cache.clear()
+                    response = self.client.get(f'{url}?cursor={cursor}')
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+        page_obj = self.client.get(
+            reverse('posts:index') + f'?cursor={cursors[0]}'
+        ).context['page_obj']
+        self.assertEqual(len(page_obj), POSTS_PER_PAGE)
+        self.assertFalse(page_obj.has_previous())
+
+
+class CommentPaginationTests(TestCase):
+    """Комментарии поста выводятся порциями по курсору."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='commented')
+        cls.post = Post.objects.create(
+            text='Популярный пост', author=cls.author
+        )
+        for i in range(COMMENTS_PER_PAGE * 2 + 5):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'commenter{i}'),
+                text=f'Комментарий {i}',
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_page_is_bounded(self):
+        """Страница поста показывает только первую порцию комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text,
+                         f'Комментарий {COMMENTS_PER_PAGE * 2 + 4}')
+        self.assertContains(response, comments.next_cursor)
+
+    def test_query_count_does_not_grow_with_comments(self):
+        """Авторы комментариев выбираются одним запросом с ними."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        # Пост с автором и группой, агрегат комментариев, порция
+        # комментариев с авторами
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+    def test_more_comments_walk_all_comments(self):
+        """Подгрузка по курсору выдаёт каждый комментарий один раз."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        texts = []
+        cursor = ''
+        while True:
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertTemplateUsed(
+                response, 'posts/includes/comment_list.html'
+            )
+            self.assertTemplateNotUsed(response, 'base.html')
+            texts.extend(
+                comment.text for comment in response.context['comments']
+            )
+            cursor = response.context['comments'].next_cursor
+            if not cursor:
+                break
+        self.assertEqual(len(texts), COMMENTS_PER_PAGE * 2 + 5)
+        self.assertEqual(len(set(texts)), len(texts))
+
+    def test_post_page_accepts_cursor(self):
+        """Без JavaScript ссылка «Ещё» открывает страницу поста с курсором."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        cursor = self.client.get(url).context['comments'].next_cursor
+        response = self.client.get(url, {'cursor': cursor})
+        self.assertEqual(response.context['comments'][0].text,
+                         f'Комментарий {COMMENTS_PER_PAGE + 4}')
+
+    def test_missing_post(self):
+        """Комментарии несуществующего поста отдают 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed_author')
+        cls.reader = User.objects.create_user(username='feed_reader')
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def follow(self):
+        self.reader_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}
+        ))
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        """Подписка добавляет старые посты, новые посты раскладываются."""
+        self.follow()
+        self.assertEqual(self.feed(), [self.old_post])
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=new_post
+        ).exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_unfollow_trims_feed(self):
+        """Отписка убирает посты автора из ленты."""
+        self.follow()
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed(), [])
+
+    def test_popular_author_is_read_on_request(self):
+        """Посты популярного автора не раскладываются, но видны в ленте."""
+        with mock.patch('posts.feed.FEED_FANOUT_MAX_FOLLOWERS', 0):
+            self.follow()
+            new_post = Post.objects.create(
+                text='Новый пост', author=self.author
+            )
+            self.assertFalse(
+                FeedEntry.objects.filter(user=self.reader).exists()
+            )
+            self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    @override_settings(FEED_WORKERS=0)
+    def test_author_no_longer_popular_is_delivered(self):
+        """Посты, вышедшие при большом числе подписчиков, не пропадают."""
+        other = User.objects.create_user(username='other_reader')
+        with mock.patch('posts.feed.FEED_FANOUT_MAX_FOLLOWERS', 1):
+            self.follow()
+            Follow.objects.create(user=other, author=self.author)
+            new_post = Post.objects.create(
+                text='Новый пост', author=self.author
+            )
+            self.assertFalse(FeedEntry.objects.filter(
+                user=self.reader, post=new_post
+            ).exists())
+            # Доставка идёт после коммита, которого в TestCase нет
+            with mock.patch(
+                'posts.background.transaction.on_commit',
+                lambda func: func(),
+            ):
+                Follow.objects.filter(user=other).delete()
+            self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_cursor_pages_read_feed_index(self):
+        """Курсорная лента подписок - диапазон по индексу ленты."""
+        self.follow()
+        for number in range(POSTS_PER_PAGE + 2):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+        url = reverse('posts:follow_index') + '?cursor='
+        first = self.reader_client.get(url).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            second = self.reader_client.get(
+                url + first.next_cursor
+            ).context['page_obj']
+        self.assertEqual(
+            list(first) + list(second),
+            list(Post.objects.order_by('-pub_date', '-pk')),
+        )
+        page_query = next(
+            query['sql'] for query in queries
+            if 'LIMIT' in query['sql'] and 'posts_feedentry' in query['sql']
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + page_query)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('feed_user_pub_date_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    @override_settings(FEED_WORKERS=0)
+    def test_catch_up_limited_per_follower(self):
+        """Каждый подписчик получает не больше FEED_BACKFILL_POSTS."""
+        other = User.objects.create_user(username='other_reader')
+        inline = mock.patch(
+            'posts.background.transaction.on_commit', lambda func: func()
+        )
+        with mock.patch('posts.feed.FEED_FANOUT_MAX_FOLLOWERS', 1), \
+                mock.patch('posts.feed.FEED_BACKFILL_POSTS', 1), inline:
+            Follow.objects.create(user=other, author=self.author)
+            self.follow()
+            new_post = Post.objects.create(
+                text='Новый пост', author=self.author
+            )
+            Follow.objects.filter(user=other).delete()
+            self.assertEqual(self.feed(), [new_post])
+
+
+class ConditionalPageTests(TestCase):
+    """Страницы отвечают 304, пока у клиента свежая копия."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.urls = {
+            reverse('posts:index'): 'posts/index.html',
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}):
+            'posts/group_list.html',
+            reverse('posts:profile', kwargs={'username': 'writer'}):
+            'posts/profile.html',
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}):
+            'posts/post_detail.html',
+            reverse('posts:follow_index'): 'posts/follow.html',
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_fresh_copy_is_not_rendered(self):
+        """Повторный запрос с ETag получает 304 без шаблона страницы."""
+        for url, template in self.urls.items():
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertTemplateNotUsed(response, template)
+                response = self.client.get(url)
+                if response.status_code != HTTPStatus.OK:
+                    continue
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_cache_control(self):
+        """Гостевые страницы можно кешировать, личные - только проверять."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        response = self.reader_client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertIn('public', not_modified['Cache-Control'])
+
+    def test_changes_refresh_pages(self):
+        """Новый пост, правка, комментарий и подписка меняют ETag."""
+        index = reverse('posts:index')
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        profile = reverse('posts:profile', kwargs={'username': 'writer'})
+        group = reverse('posts:group_list', kwargs={'slug': 'group'})
+
+        def rename_group():
+            group = Group.objects.get(pk=self.group.pk)
+            group.title = 'Новое название'
+            group.save()
+        changes = (
+            (index, lambda: Post.objects.create(
+                text='Ещё пост', author=self.author
+            )),
+            (group, rename_group),
+            (detail, lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            )),
+            (profile, lambda: Follow.objects.filter(
+                user=self.reader
+            ).delete()),
+        )
+        for url, change in changes:
+            etag = self.reader_client.get(url)['ETag']
+            change()
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_pages_differ_between_users(self):
+        """Копия одного пользователя не подходит другому."""
+        url = reverse('posts:index')
+        etag = self.reader_client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_cursor_pages_do_not_count_feed(self):
+        """Курсорная страница не считает ленту, но видит свои изменения."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:follow_index'),
+            reverse('api:index'),
+        )
+        for url in urls:
+            url += '?cursor='
+            with self.subTest(url=url):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    etag = self.reader_client.get(url)['ETag']
+                self.assertFalse([
+                    query for query in queries
+                    if 'COUNT(' in query['sql'] or 'MAX(' in query['sql']
+                ])
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                post = Post.objects.create(text='Новый', author=self.author)
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                post.delete()
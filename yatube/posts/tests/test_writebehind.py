@@ -0,0 +1,163 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import writebehind
+from posts.models import Comment, FeedEntry, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+@override_settings(WRITE_BEHIND=True)
+class WriteBehindTests(TestCase):
+    """Фоновый поток не запускается: очередь пишет drain() в потоке
+    теста, внутри его транзакции."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        patcher = mock.patch('posts.writebehind.start_worker')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(writebehind._queue.clear)
+
+    def comment(self, text, post=None):
+        return self.client.post(
+            reverse('posts:add_comment', kwargs={
+                'post_id': (post or self.post).pk
+            }),
+            {'text': text},
+        )
+
+    def detail(self):
+        return self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ).content.decode()
+
+    def test_comment_waits_in_queue(self):
+        """Комментарий не пишется в запросе, но автор сразу его видит."""
+        self.comment('Ждёт записи')
+        self.assertFalse(Comment.objects.exists())
+        self.assertIn('Ждёт записи', self.detail())
+        other = Client()
+        self.assertNotIn('Ждёт записи', other.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )).content.decode())
+
+    def test_drain_writes_batch(self):
+        """Очередь пишется пакетом со всем, что делают сигналы."""
+        for number in range(3):
+            self.comment(f'Комментарий {number}')
+        writebehind.drain()
+        self.assertEqual(
+            list(Comment.objects.order_by('created', 'pk').values_list(
+                'text', flat=True
+            )),
+            ['Комментарий 0', 'Комментарий 1', 'Комментарий 2'],
+        )
+        self.assertEqual(UserStats.objects.get(user=self.user).comments, 3)
+        page = self.detail()
+        self.assertEqual(page.count('Комментарий 0'), 1)
+        self.assertNotIn('отправляется', page)
+
+    def test_comment_to_deleted_post_dropped(self):
+        """Комментарий к посту, удалённому до записи, пропадает."""
+        post = Post.objects.create(author=self.author, text='Удалят')
+        self.comment('В пустоту', post)
+        post.delete()
+        writebehind.drain()
+        self.assertFalse(Comment.objects.exists())
+
+    def test_comment_of_deleted_author_dropped(self):
+        """Комментарий удалённого автора пропадает, остальные пишутся."""
+        self.comment('Останется')
+        other = User.objects.create_user(username='leaver')
+        self.client.force_login(other)
+        self.comment('Пропадёт')
+        other.delete()
+        writebehind.drain()
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)),
+            ['Останется'],
+        )
+
+    def test_bad_row_does_not_lose_batch(self):
+        """Ошибка одной записи не теряет остальные записи пакета."""
+        self.comment('Хороший')
+        self.comment('Плохой')
+        bulk_insert = writebehind.bulk_insert
+
+        def insert(model, objects):
+            if any(obj.text == 'Плохой' for obj in objects):
+                raise IntegrityError('FOREIGN KEY constraint failed')
+            bulk_insert(model, objects)
+        with mock.patch('posts.writebehind.bulk_insert', insert), \
+                self.assertLogs('posts.writebehind', 'ERROR'):
+            writebehind.drain()
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)),
+            ['Хороший'],
+        )
+
+    def test_follow_waits_in_queue(self):
+        """Подписка пишется позже, кнопка и лента - как после записи."""
+        profile = reverse(
+            'posts:profile', kwargs={'username': self.author.username}
+        )
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author.username}
+        ))
+        self.assertFalse(Follow.objects.exists())
+        self.assertIn('Отписаться', self.client.get(profile).content.decode())
+        writebehind.drain()
+        self.assertTrue(
+            Follow.objects.filter(user=self.user, author=self.author).exists()
+        )
+        self.assertEqual(UserStats.objects.get(user=self.user).following, 1)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=self.post).exists()
+        )
+
+    def test_unfollow_cancels_queued_follow(self):
+        """Отписка до записи отменяет подписку из очереди."""
+        for name in ('posts:profile_follow', 'posts:profile_unfollow'):
+            self.client.get(
+                reverse(name, kwargs={'username': self.author.username})
+            )
+        writebehind.drain()
+        self.assertFalse(Follow.objects.exists())
+
+    def test_repeated_follow_written_once(self):
+        """Повторная подписка не создаёт вторую строку."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author.username}
+        ))
+        writebehind.drain()
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(UserStats.objects.get(user=self.user).following, 1)
+
+    def test_write_keeps_model_fields(self):
+        """Запись пакета не трогает auto_now_add, общий для всех потоков."""
+        self.comment('Комментарий')
+        field = Post._meta.get_field('pub_date')
+        states = []
+
+        def insert(model, objects):
+            states.append(field.auto_now_add)
+            model.objects.bulk_create(objects)
+        with mock.patch('posts.writebehind.bulk_insert', insert):
+            writebehind.drain()
+        self.assertEqual(states, [True])
+        self.assertIsNotNone(Comment.objects.get().created)
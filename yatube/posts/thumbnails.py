@@ -0,0 +1,21 @@
+from sorl.thumbnail import get_thumbnail
+
+from .background import Pool
+from .images import thumbnail_specs
+
+pool = Pool('thumbnails', 'THUMBNAIL_WORKERS')
+
+
+def pregenerate(image):
+    """Render every thumbnail the templates ask for, in this thread."""
+    for geometry, options in thumbnail_specs():
+        get_thumbnail(image, geometry, **options)
+
+
+def schedule(post):
+    """Make thumbnails of the post image once the transaction commits.
+
+    With THUMBNAIL_WORKERS = 0 they are made right in the committing
+    thread, otherwise in the background pool.
+    """
+    pool.after_commit(pregenerate, post.image)
@@ -0,0 +1,308 @@
+"""Streaming NDJSON dumps of users, groups, posts, comments and follows.
+
+A dump is one JSON object per line, its "model" key tells the kind.
+Kinds follow in the order of MODELS, so a reference always points to a
+line read before. Users and groups are matched by username and slug,
+posts get new ids and comments find them through an id map. Only the id
+maps and one batch of rows are kept in memory.
+"""
+import csv
+import json
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from . import blobs, cards, feed, search, stats
+from .models import Comment, Follow, Group, Post, User
+
+MODELS = ('user', 'group', 'post', 'comment', 'follow')
+# Поля дампа и поля моделей, из которых они берутся
+FIELDS = {
+    'user': (User, {
+        'username': 'username',
+        'first_name': 'first_name',
+        'last_name': 'last_name',
+        'email': 'email',
+    }),
+    'group': (Group, {
+        'id': 'pk',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+    }),
+    'post': (Post, {
+        'id': 'pk',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author': 'author__username',
+        'group': 'group_id',
+        'image': 'image',
+    }),
+    'comment': (Comment, {
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    'follow': (Follow, {
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+
+
+def _encode(value):
+    # Даты целиком, с микросекундами: по ним сортируются ленты
+    return value.isoformat()
+
+
+def records(kind, queryset, chunk_size):
+    """Rows of the queryset as dump records, read chunk_size at a time."""
+    fields = FIELDS[kind][1]
+    rows = queryset.order_by('pk').values_list(*fields.values())
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield {'model': kind, **dict(zip(fields, row))}
+
+
+def dumps(record):
+    """One line of the dump, without the newline."""
+    return json.dumps(record, ensure_ascii=False, default=_encode)
+
+
+class _Echo:
+    """File for csv.writer which hands every row back."""
+
+    def write(self, line):
+        return line
+
+
+def csv_lines(kind, records):
+    """The records as CSV, header first, dates as in the dump."""
+    fields = list(FIELDS[kind][1])
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for record in records:
+        yield writer.writerow(
+            _encode(value) if hasattr(value, 'isoformat') else value
+            for value in map(record.get, fields)
+        )
+
+
+def buffered(lines, size):
+    """Join lines into chunks of about size characters for streaming."""
+    chunk, length = [], 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def export(write, chunk_size, progress):
+    """Pass every line of the dump to write(), returns counts by kind."""
+    counts = {}
+    for kind in MODELS:
+        model = FIELDS[kind][0]
+        counts[kind] = 0
+        for record in records(kind, model.objects.all(), chunk_size):
+            write(dumps(record))
+            counts[kind] += 1
+            if counts[kind] % chunk_size == 0:
+                progress(kind, counts[kind])
+        progress(kind, counts[kind])
+    return counts
+
+
+@contextmanager
+def keep_dates():
+    """Let bulk_create store dates from the dump instead of now()."""
+    fields = (
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    )
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def top_id(model):
+    return model.objects.aggregate(top=Max('pk'))['top'] or 0
+
+
+def bulk_insert(model, objects, **kwargs):
+    """bulk_create which leaves the new ids on the objects."""
+    if not connection.features.can_return_ids_from_bulk_insert:
+        # SQLite не возвращает id из bulk_create: выдаём их сами,
+        # вызывать внутри транзакции
+        start = top_id(model) + 1
+        for offset, obj in enumerate(objects):
+            obj.pk = start + offset
+    model.objects.bulk_create(objects, **kwargs)
+
+
+def rebuild_derived(last_post, last_follow):
+    """Rebuild what signals maintain after a load with bulk_create.
+
+    Posts and follows with ids above the given ones are fanned out to
+    the feeds; counters, image references and the search index are
+    rebuilt whole, and every cached card and page is invalidated.
+    """
+    stats.rebuild_all()
+    blobs.recount()
+    feed.deliver_since(last_post, last_follow)
+    search.backend().rebuild()
+    for kind in ('post', 'comment', 'group', 'user'):
+        cards.bump(kind, cards.ANY)
+
+
+class Importer:
+    """Load a dump line by line in batches, each in its own transaction.
+
+    bulk_create skips signals, so finish() rebuilds what they maintain:
+    counters, image references, feeds, the search index and the cache
+    versions.
+    """
+
+    def __init__(self, batch_size, progress):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.slugs = dict(Group.objects.values_list('slug', 'pk'))
+        self.groups = {}
+        # Старые id постов растут, новые тоже: два массива вместо словаря
+        self.old_posts = array('q')
+        self.new_posts = array('q')
+        self.last_post = top_id(Post)
+        self.last_follow = top_id(Follow)
+        self.counts = dict.fromkeys(MODELS, 0)
+        self.kind = None
+        self.batch = []
+
+    def feed(self, line):
+        """Take one line of the dump, raises ValueError for a bad one."""
+        if not line.strip():
+            return
+        record = json.loads(line)
+        kind = record.get('model')
+        if kind not in MODELS:
+            raise ValueError(f'Неизвестный вид записи: {kind!r}')
+        if kind != self.kind:
+            if self.kind and MODELS.index(kind) < MODELS.index(self.kind):
+                raise ValueError(
+                    f'Записи {kind} должны идти до записей {self.kind}'
+                )
+            self.flush()
+            self.kind = kind
+        try:
+            self.batch.append(getattr(self, f'build_{kind}')(record))
+        except KeyError as error:
+            raise ValueError(f'Нет поля или объекта {error}') from None
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def user_id(self, username):
+        try:
+            return self.users[username]
+        except KeyError:
+            raise ValueError(f'Пользователя {username} нет в дампе') from None
+
+    def post_id(self, old_id):
+        if old_id is None:
+            return None
+        index = bisect_left(self.old_posts, old_id)
+        if index == len(self.old_posts) or self.old_posts[index] != old_id:
+            raise ValueError(f'Поста {old_id} нет в дампе')
+        return self.new_posts[index]
+
+    def build_user(self, record):
+        if record['username'] in self.users:
+            return None
+        return User(
+            username=record['username'],
+            first_name=record['first_name'],
+            last_name=record['last_name'],
+            email=record['email'],
+            password=make_password(None),
+        )
+
+    def build_group(self, record):
+        if record['slug'] in self.slugs:
+            self.groups[record['id']] = self.slugs[record['slug']]
+            return None
+        group = Group(
+            title=record['title'],
+            slug=record['slug'],
+            description=record['description'],
+        )
+        group.old_id = record['id']
+        return group
+
+    def build_post(self, record):
+        if self.old_posts and record['id'] <= self.old_posts[-1]:
+            raise ValueError('Посты должны идти по возрастанию id')
+        group = record['group']
+        post = Post(
+            text=record['text'],
+            pub_date=parse_datetime(record['pub_date']),
+            author_id=self.user_id(record['author']),
+            group_id=self.groups[group] if group is not None else None,
+            image=record['image'] or None,
+        )
+        post.old_id = record['id']
+        return post
+
+    def build_comment(self, record):
+        return Comment(
+            post_id=self.post_id(record['post']),
+            author_id=self.user_id(record['author']),
+            text=record['text'],
+            created=parse_datetime(record['created']),
+        )
+
+    def build_follow(self, record):
+        return Follow(
+            user_id=self.user_id(record['user']),
+            author_id=self.user_id(record['author']),
+        )
+
+    def flush(self):
+        objects = [obj for obj in self.batch if obj is not None]
+        skipped = len(self.batch) - len(objects)
+        self.batch = []
+        if not self.kind:
+            return
+        with transaction.atomic(), keep_dates():
+            if self.kind == 'follow':
+                # id подписок не нужны, повторные подписки пропускаем
+                Follow.objects.bulk_create(objects, ignore_conflicts=True)
+            elif objects:
+                bulk_insert(FIELDS[self.kind][0], objects)
+        for obj in objects:
+            if self.kind == 'user':
+                self.users[obj.username] = obj.pk
+            elif self.kind == 'group':
+                self.groups[obj.old_id] = self.slugs[obj.slug] = obj.pk
+            elif self.kind == 'post':
+                self.old_posts.append(obj.old_id)
+                self.new_posts.append(obj.pk)
+        self.counts[self.kind] += len(objects) + skipped
+        self.progress(self.kind, self.counts[self.kind])
+
+    def finish(self, rebuild=True):
+        """Write the last batch and rebuild data kept by signals."""
+        self.flush()
+        if rebuild:
+            rebuild_derived(self.last_post, self.last_follow)
+        return self.counts
@@ -1,88 +1,179 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
-from .forms import CommentForm, PostForm
+from core.replicas import pin_primary, replica_reads
+
+from . import transfer, writebehind
+from .cards import attach_versions
+from .feed import follow_feed
+from .forms import CommentForm, PostForm, SearchForm
+from .freshness import feed_aggregate, page_rows, respond, state
 from .models import Follow, Group, Post, User
+from .pagecache import cached_page, post_versions
+from .paginators import CursorPaginator
+from .search import backend
+from .settings import (COMMENTS_PER_PAGE, EXPORT_CHUNK_CHARS, POSTS_PER_PAGE,
+                       TRANSFER_BATCH_SIZE)
+from .stats import get_stats
 
 
 User = get_user_model()
 
+EXPORT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
 
-def p_paginator(post, request):
-    paginator = Paginator(post, 10)
+def paginate(post, request, count=None):
+    # ?cursor= переключает ленту на keyset-пагинацию без COUNT и OFFSET
+    if 'cursor' in request.GET:
+        paginator = CursorPaginator(post, POSTS_PER_PAGE)
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = Paginator(post, POSTS_PER_PAGE)
+    if count is not None:
+        # Число постов уже посчитано для ETag, второй COUNT не нужен
+        paginator.count = count
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    return paginator.get_page(page_number)
+
+
+def comments_page(post, request):
+    """One page of comments of the post starting at ?cursor=."""
+    paginator = CursorPaginator(
+        post.comments.select_related('author'), COMMENTS_PER_PAGE,
+        field='created',
+    )
+    return paginator.get_page(request.GET.get('cursor'))
+
 
+def feed_page(request, post, template, context, *parts):
+    """Render a feed, or answer 304 if the client has it already.
+
+    Only a numbered page counts the whole feed, its paginator needs the
+    count anyway. A cursor page is fetched first and described by its
+    own rows, the render reuses it.
+    """
+    count = page_obj = None
+    if 'cursor' in request.GET:
+        page_obj = paginate(post, request)
+        rows, last = page_rows(page_obj)
+        parts = (*parts, *rows)
+    else:
+        aggregate = feed_aggregate(post)
+        count, last = aggregate['count'], aggregate['last']
+        parts = (*parts, count)
+    etag, last_modified = state(
+        request.get_full_path(), request.user.pk, *parts, last=last,
+    )
 
+    def build():
+        page = page_obj
+        if page is None:
+            page = paginate(post, request, count)
+        attach_versions(page)
+        context['page_obj'] = page
+        return render(request, template, context)
+    return respond(request, etag, last_modified, build)
+
+
+@cached_page
+@replica_reads
 def index(request):
-    post = Post.objects.all()
-    page_obj = p_paginator(post, request)
-    context = {
-        'page_obj': page_obj,
-    }
-    return render(request, 'posts/index.html', context)
+    post = Post.objects.for_feed()
+    return feed_page(request, post, 'posts/index.html', {})
 
 
+@cached_page
+@replica_reads
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post = group.posts.all()
-    page_obj = p_paginator(post, request)
+    post = group.posts.for_feed()
     context = {
         'group': group,
-        'page_obj': page_obj,
     }
-    return render(request, 'posts/group_list.html', context)
+    return feed_page(request, post, 'posts/group_list.html', context)
 
 
+@cached_page
+@replica_reads
 def profile(request, username):
     template = 'posts/profile.html'
-    user = get_object_or_404(User, username=username)
-    post = user.posts.all()
-    page_obj = p_paginator(post, request)
-    following = (
-        request.user.is_authenticated
-        and request.user != user and Follow.objects.filter(
-            user=request.user, author=user
-        )
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username
     )
+    post = user.posts.for_feed()
+    author_stats = get_stats(user)
     context = {
         'author': user,
-        'page_obj': page_obj,
-        'following': following,
+        'author_stats': author_stats,
     }
-    return render(request, template, context)
+    return feed_page(request, post, template, context, author_stats.posts)
 
 
+@cached_page(keys=post_versions)
+@replica_reads
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    post_count = post.author.posts.count()
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
+    post_count = get_stats(post.author).posts
+    aggregate = post.comments.order_by().aggregate(
+        count=Count('pk'), last=Max('created')
+    )
+    etag, last_modified = state(
+        request.get_full_path(), request.user.pk, post_count,
+        aggregate['count'],
+        last=max(filter(None, (post.pub_date, aggregate['last']))),
+    )
+
+    def build():
+        context = {
+            'post': post,
+            'form': CommentForm(),
+            'posts_count': post_count,
+            'comments': comments_page(post, request),
+        }
+        return render(request, 'posts/post_detail.html', context)
+    return respond(request, etag, last_modified, build)
+
+
+@cached_page(keys=post_versions)
+def post_comments(request, post_id):
+    """Next comments of a post as a fragment for the post page."""
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
     context = {
         'post': post,
-        'form': CommentForm(),
-        'posts_count': post_count,
-        'comments': comments,
+        'comments': comments_page(post, request),
     }
-    return render(request, 'posts/post_detail.html', context)
+    return render(request, 'posts/includes/comment_list.html', context)
 
 
 @login_required
+@pin_primary
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     context = {'form': form}
     if request.method == 'POST' and form.is_valid():
         form.instance.author = request.user
-        post = form.save()
-        post.author = request.user
-        post.save()
+        # Блокировку записи берём только на сохранение: картинку форма
+        # уже проверила и пересобрала
+        with transaction.atomic():
+            post = form.save()
+            post.author = request.user
+            post.save()
         return redirect('posts:profile', request.user.username)
     return render(request, 'posts/create_post.html', context)
 
 
 @login_required
+@pin_primary
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id, author=request.user)
     if request.user != post.author:
@@ -93,7 +184,9 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        # Новая картинка пишется под блокировкой записи, см. blobs.purge
+        with transaction.atomic():
+            form.save()
         return redirect('posts:post_detail', post_id=post_id)
     return render(request, 'posts/create_post.html', {
         'form': form,
@@ -103,37 +196,105 @@ def post_edit(request, post_id):
 
 
 @login_required
+@pin_primary
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        if settings.WRITE_BEHIND:
+            writebehind.add_comment(comment)
+        else:
+            with transaction.atomic():
+                comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@replica_reads
 def follow_index(request):
-    post = Post.objects.filter(author__following__user=request.user)
-    page_obj = p_paginator(post, request)
+    post = follow_feed(request.user)
+    return feed_page(request, post, 'posts/follow.html', {})
+
+
+def search(request):
+    form = SearchForm(request.GET or None)
+    found = []
+    if form.is_valid() and form.cleaned_data['q']:
+        group = form.cleaned_data['group']
+        author = None
+        if form.cleaned_data['author']:
+            author = User.objects.filter(
+                username=form.cleaned_data['author']
+            ).values_list('pk', flat=True).first()
+        if author is not None or not form.cleaned_data['author']:
+            found = backend().search(
+                form.cleaned_data['q'],
+                group_id=group.pk if group else None,
+                author_id=author,
+            )
+    # Страница списка id, посты загружаются только для неё
+    page_obj = Paginator(found, POSTS_PER_PAGE).get_page(
+        request.GET.get('page')
+    )
+    posts = Post.objects.for_feed().in_bulk(page_obj.object_list)
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts
+    ]
+    attach_versions(page_obj)
+    query = request.GET.copy()
+    query.pop('page', None)
     context = {
+        'form': form,
         'page_obj': page_obj,
+        'query': query.urlencode() + '&' if query else '',
     }
-    return render(request, 'posts/follow.html', context)
+    return render(request, 'posts/search.html', context)
 
 
 @login_required
+@pin_primary
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        if settings.WRITE_BEHIND:
+            writebehind.add_follow(request.user, author)
+        else:
+            with transaction.atomic():
+                Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
+@pin_primary
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    if settings.WRITE_BEHIND:
+        writebehind.forget_follow(request.user, username)
+    with transaction.atomic():
+        Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
+
+
+@login_required
+def export_posts(request, format):
+    """Stream the user's own posts as CSV or NDJSON, row by row."""
+    if format not in EXPORT_TYPES:
+        raise Http404
+    posts = Post.objects.filter(author=request.user)
+    records = transfer.records('post', posts, TRANSFER_BATCH_SIZE)
+    if format == 'csv':
+        lines = transfer.csv_lines('post', records)
+    else:
+        # Те же строки, что в дампе export_ndjson
+        lines = (transfer.dumps(record) + '\n' for record in records)
+    response = StreamingHttpResponse(
+        transfer.buffered(lines, EXPORT_CHUNK_CHARS),
+        content_type=EXPORT_TYPES[format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="posts.{format}"'
+    )
+    return response
@@ -0,0 +1,253 @@
+"""Write-behind of comments and follows for burst traffic.
+
+With WRITE_BEHIND add_comment and profile_follow don't write in the
+request: they queue the row in memory, and a background thread writes
+queued rows in batches with one bulk_create per kind and one transaction
+per batch, doing what the post_save signals would. The queue is drained
+at interpreter exit, so a graceful restart keeps every accepted write;
+a crashed process loses at most the last WRITE_BEHIND_FLUSH_SECONDS.
+
+Until its row is written, a user sees their comment and follow through
+markers in the cache (see the pending_comments and follow_button holes).
+The markers work across processes with a shared cache (file or
+memcached), with locmem only in the process that queued the write.
+"""
+import atexit
+import logging
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import (IntegrityError, OperationalError, connection,
+                       transaction)
+
+from . import cards, feed, search
+from .models import Comment, Follow, Post, User
+from .stats import bump
+from .transfer import bulk_insert
+
+logger = logging.getLogger(__name__)
+
+COMMENTS_KEY = 'writebehind:comments:{}:{}'
+FOLLOW_KEY = 'writebehind:follow:{}:{}'
+# Маркеры переживают запись с запасом: их снимает сам писатель
+MARKER_TIMEOUT = 5 * 60
+
+_queue = []
+_condition = threading.Condition()
+_worker = None
+# Пакетов, взятых потоком и ещё не записанных
+_writing = 0
+
+
+def add_comment(comment):
+    """Queue a new comment and show it to its author until written.
+
+    The comment gets its created date when the batch is written.
+    """
+    comment.token = uuid.uuid4().hex
+    key = COMMENTS_KEY.format(comment.post_id, comment.author_id)
+    # Чтение и запись не атомарны: два одновременных комментария одного
+    # автора к одному посту могут потерять маркер, но не сам комментарий
+    pending = cache.get(key, [])
+    pending.append({'token': comment.token, 'text': comment.text})
+    cache.set(key, pending, MARKER_TIMEOUT)
+    _put(comment)
+
+
+def add_follow(user, author):
+    """Queue a follow, the follow button shows it at once."""
+    cache.set(
+        FOLLOW_KEY.format(user.pk, author.username), True, MARKER_TIMEOUT
+    )
+    follow = Follow(user=user, author=author)
+    follow.username = author.username
+    _put(follow)
+
+
+def forget_follow(user, username):
+    """Cancel a queued follow of a user who has just unfollowed."""
+    cache.set(FOLLOW_KEY.format(user.pk, username), False, MARKER_TIMEOUT)
+
+
+def pending_comments(user, post_id):
+    """Comments of the user to the post which are still queued."""
+    if not settings.WRITE_BEHIND or not user.is_authenticated:
+        return []
+    return cache.get(COMMENTS_KEY.format(post_id, user.pk), [])
+
+
+def following(user, username):
+    """Latest follow intent of the user, None when nothing is queued."""
+    if not settings.WRITE_BEHIND:
+        return None
+    return cache.get(FOLLOW_KEY.format(user.pk, username))
+
+
+def _put(obj):
+    with _condition:
+        _queue.append(obj)
+        start_worker()
+        _condition.notify()
+
+
+def start_worker():
+    """Start the flushing thread unless it runs already."""
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        _worker = threading.Thread(
+            target=_run, name='write-behind', daemon=True
+        )
+        _worker.start()
+
+
+def _take():
+    global _writing
+    # Ждём первую запись, потом полный пакет, но не дольше интервала
+    with _condition:
+        _condition.wait_for(lambda: _queue)
+        _condition.wait_for(
+            lambda: len(_queue) >= settings.WRITE_BEHIND_BATCH_SIZE,
+            timeout=settings.WRITE_BEHIND_FLUSH_SECONDS,
+        )
+        batch = _queue[:settings.WRITE_BEHIND_BATCH_SIZE]
+        del _queue[:len(batch)]
+        _writing += 1
+    return batch
+
+
+def _run():
+    global _writing
+    while True:
+        batch = _take()
+        try:
+            write_batch(batch)
+        except OperationalError:
+            # База занята дольше busy_timeout: пакет пойдёт следующим
+            logger.exception('Не удалось записать пакет, повтор')
+            with _condition:
+                _queue[:0] = batch
+        except Exception:
+            logger.exception('Пакет из %d записей потерян', len(batch))
+        finally:
+            connection.close()
+            with _condition:
+                _writing -= 1
+                _condition.notify_all()
+
+
+def write_batch(batch):
+    """Write a batch, row by row if one of its rows breaks a constraint.
+
+    A bad row loses only itself, not the accepted writes of others.
+    """
+    try:
+        write(batch)
+    except IntegrityError:
+        logger.exception('Пакет не записан, пишем записи по одной')
+        for obj in batch:
+            try:
+                write([obj])
+            except IntegrityError:
+                logger.exception('Запись %r потеряна', obj)
+
+
+def write(batch):
+    """Write queued comments and follows in one transaction."""
+    comments = [obj for obj in batch if isinstance(obj, Comment)]
+    follows = [obj for obj in batch if isinstance(obj, Follow)]
+    # keep_dates() здесь нельзя: он на время меняет поля модели во всём
+    # процессе, и пост из соседнего запроса сохранился бы без даты
+    with transaction.atomic():
+        if comments:
+            _write_comments(comments)
+        if follows:
+            _write_follows(follows)
+    _forget_comments(comments)
+
+
+def _write_comments(comments):
+    # Пост или автора могли удалить, пока комментарий ждал в очереди
+    posts = set(Post.objects.filter(
+        pk__in={comment.post_id for comment in comments}
+    ).values_list('pk', flat=True))
+    authors = set(User.objects.filter(
+        pk__in={comment.author_id for comment in comments}
+    ).values_list('pk', flat=True))
+    comments = [
+        comment for comment in comments
+        if comment.post_id in posts and comment.author_id in authors
+    ]
+    bulk_insert(Comment, comments)
+    for author_id, count in Counter(
+        comment.author_id for comment in comments
+    ).items():
+        bump(author_id, 'comments', count)
+    index = search.backend()
+    for comment in comments:
+        index.index_comment(comment)
+    for post_id in {comment.post_id for comment in comments}:
+        cards.bump('comment', post_id)
+
+
+def _write_follows(follows):
+    wanted = {}
+    for follow in follows:
+        key = FOLLOW_KEY.format(follow.user_id, follow.username)
+        # Отписался, пока подписка ждала в очереди
+        if cache.get(key) is not False:
+            wanted[follow.user_id, follow.author_id] = follow
+    users = set(User.objects.filter(
+        pk__in={pk for pair in wanted for pk in pair}
+    ).values_list('pk', flat=True))
+    existing = set(Follow.objects.filter(
+        user_id__in={user_id for user_id, _ in wanted},
+        author_id__in={author_id for _, author_id in wanted},
+    ).values_list('user_id', 'author_id'))
+    new = [
+        follow for pair, follow in wanted.items()
+        if pair not in existing and users.issuperset(pair)
+    ]
+    bulk_insert(Follow, new)
+    for field, key in (('following', 'user_id'), ('followers', 'author_id')):
+        for user_id, count in Counter(
+            getattr(follow, key) for follow in new
+        ).items():
+            bump(user_id, field, count)
+    for follow in new:
+        feed.backfill(follow.user_id, follow.author_id)
+
+
+def _forget_comments(comments):
+    written = {}
+    for comment in comments:
+        key = COMMENTS_KEY.format(comment.post_id, comment.author_id)
+        written.setdefault(key, set()).add(comment.token)
+    for key, tokens in written.items():
+        left = [
+            pending for pending in cache.get(key, [])
+            if pending['token'] not in tokens
+        ]
+        if left:
+            cache.set(key, left, MARKER_TIMEOUT)
+        else:
+            cache.delete(key)
+
+
+@atexit.register
+def drain():
+    """Write everything still queued, in the calling thread.
+
+    Waits for the batch the background thread is writing, so nothing
+    accepted is lost at a graceful shutdown.
+    """
+    while True:
+        with _condition:
+            _condition.wait_for(lambda: not _writing)
+            batch = _queue[:settings.WRITE_BEHIND_BATCH_SIZE]
+            del _queue[:len(batch)]
+        if not batch:
+            return
+        write_batch(batch)
@@ -7,6 +7,8 @@ from django.contrib.auth.views import (LoginView, LogoutView,
                                        PasswordResetView)
 from django.urls import path, reverse_lazy
 
+from core.replicas import pin_primary
+
 from . import views
 
 app_name = 'users'
@@ -18,9 +20,9 @@ urlpatterns = [
         name='password_reset_confirm'),
     path('logout/', LogoutView.as_view(
         template_name='users/logged_out.html'), name='logout'),
-    path('signup/', views.SignUp.as_view(), name='signup'),
-    path('login/', LoginView.as_view(
-        template_name='users/login.html'), name='login'),
+    path('signup/', pin_primary(views.SignUp.as_view()), name='signup'),
+    path('login/', pin_primary(LoginView.as_view(
+        template_name='users/login.html')), name='login'),
     path('password_reset/', PasswordResetView.as_view(
         template_name='users/password_reset_form.html',
         success_url=reverse_lazy('users:password_reset_done')),
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,13 +86,54 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Соединения живут между запросами, а не открываются на каждый
+CONN_MAX_AGE = int(os.environ.get('YATUBE_CONN_MAX_AGE', 60))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
     }
 }
 
+# Выполняются при каждом новом соединении с SQLite (см. core/sqlite.py).
+# WAL пускает читателей параллельно с писателем, synchronous=NORMAL в WAL
+# не теряет целостность при падении процесса, busy_timeout - сколько
+# миллисекунд писатель ждёт блокировку, прежде чем получить
+# "database is locked". cache_size в минус-килобайтах - на соединение
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('YATUBE_SQLITE_BUSY_TIMEOUT', 20000)),
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -16 * 1024,
+    'temp_store': 'MEMORY',
+}
+# Транзакции берут блокировку записи сразу (BEGIN IMMEDIATE): отложенная
+# транзакция, начавшая писать после чужого коммита, падает, не дожидаясь
+# busy_timeout
+SQLITE_IMMEDIATE_TRANSACTIONS = True
+
+# Реплики только для чтения: YATUBE_READ_REPLICAS=2 добавляет базы
+# replica1 и replica2 рядом с основной. Локально их наполняет
+# manage.py replicate, копируя основную базу; в тестах это она же
+READ_REPLICAS = [
+    f'replica{number}'
+    for number in range(1, int(os.environ.get('YATUBE_READ_REPLICAS', 0)) + 1)
+]
+for alias in READ_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Сколько секунд после записи пользователь читает только основную базу;
+# столько же живёт в кэше страница, собранная по реплике
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -147,8 +189,57 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Кэш задаётся окружением: locmem живёт внутри одного процесса, file и
+# memcached (в том числе через unix-сокет) общие для всех воркеров;
+# memcached работает через python-memcached из requirements.txt
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+}
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE_BACKEND', 'locmem')
+CACHE_DEFAULT_LOCATIONS = {
+    'locmem': 'yatube',
+    'file': os.path.join(BASE_DIR, '.cache'),
+    'memcached': '127.0.0.1:11211',
+}
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', CACHE_DEFAULT_LOCATIONS[CACHE_BACKEND]
+        ),
+        'KEY_PREFIX': os.environ.get('YATUBE_CACHE_KEY_PREFIX', 'yatube'),
+        # Увеличьте при несовместимой смене формата закэшированных данных
+        'VERSION': int(os.environ.get('YATUBE_CACHE_VERSION', 1)),
+        'TIMEOUT': int(os.environ.get('YATUBE_CACHE_TIMEOUT', 300)),
     }
 }
+
+# Замеры запросов по представлениям: число запросов к базе, время базы
+# и шаблонов, размер ответа. Гистограммы лежат в кэше и видны сотрудникам
+# на /admin/metrics/, запросы дольше REQUEST_METRICS_SLOW_MS пишутся
+# в лог вместе с самыми долгими SQL
+REQUEST_METRICS = os.environ.get('YATUBE_REQUEST_METRICS', '') == '1'
+REQUEST_METRICS_SLOW_MS = int(
+    os.environ.get('YATUBE_REQUEST_METRICS_SLOW_MS', 500)
+)
+REQUEST_METRICS_SLOW_QUERIES = 5
+REQUEST_METRICS_FLUSH_SECONDS = 10
+
+# Сколько потоков создают миниатюры после сохранения поста с картинкой;
+# 0 - создавать сразу после коммита в потоке запроса (так в тестах:
+# фоновый поток писал бы в базу и MEDIA_ROOT посреди теста)
+THUMBNAIL_WORKERS = int(os.environ.get('YATUBE_THUMBNAIL_WORKERS', 2))
+# Потоки для доставки в ленты постов автора, чьих подписчиков стало не
+# больше FEED_FANOUT_MAX_FOLLOWERS; 0 - так же, сразу после коммита
+FEED_WORKERS = int(os.environ.get('YATUBE_FEED_WORKERS', 1))
+
+# Отложенная запись комментариев и подписок: запрос только ставит строку
+# в очередь процесса, фоновый поток пишет очередь пакетами по
+# WRITE_BEHIND_BATCH_SIZE не реже раза в WRITE_BEHIND_FLUSH_SECONDS
+# (см. posts/writebehind.py)
+WRITE_BEHIND = os.environ.get('YATUBE_WRITE_BEHIND', '') == '1'
+WRITE_BEHIND_BATCH_SIZE = 500
+WRITE_BEHIND_FLUSH_SECONDS = 0.2
@@ -18,6 +18,8 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import request_metrics
+
 
 handler404 = 'core.views.page_not_found'
 handler403 = 'core.views.permission_denied'
@@ -25,6 +27,8 @@ handler500 = 'core.views.server_error'
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
+    path('api/v1/', include('posts.api_urls', namespace='api')),
+    path('admin/metrics/', request_metrics, name='request_metrics'),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),